@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from logpipeline import default_log
+
+DEFAULT_MAX_ATTACHMENT_BYTES = 20 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_hash_cache = {}
+_hash_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AttachmentInfo:
+    path: str
+    exists: bool
+    size: int = 0
+    mtime_ns: int = 0
+    sha256: str = ""
+    error: str = ""
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+@dataclass(frozen=True)
+class ResolvedAttachments:
+    paths: tuple
+    infos: tuple
+    note: str
+    total_size: int
+    problem: str = ""
+
+
+NO_ATTACHMENTS = ResolvedAttachments((), (), "No attachment specified.", 0)
+
+
+def split_attachment_cell(cell) -> list:
+    if not isinstance(cell, str) or not cell:
+        return []
+    paths = []
+    for path in cell.split(';'):
+        clean_path = path.strip().strip('"').strip("'")
+        if clean_path:
+            paths.append(clean_path)
+    return paths
+
+
+def file_digest(path: str, size: int, mtime_ns: int) -> str:
+    key = (path, size, mtime_ns)
+    with _hash_cache_lock:
+        digest = _hash_cache.get(key)
+    if digest is not None:
+        return digest
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+    with _hash_cache_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+def inspect_file(path: str, hash_files: bool = True) -> AttachmentInfo:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return AttachmentInfo(path, False)
+    if not os.path.isfile(path):
+        return AttachmentInfo(path, False, error="not a file")
+    try:
+        digest = file_digest(path, st.st_size, st.st_mtime_ns) if hash_files else ""
+    except OSError as e:
+        return AttachmentInfo(path, True, st.st_size, st.st_mtime_ns, error=str(e))
+    return AttachmentInfo(path, True, st.st_size, st.st_mtime_ns, digest)
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class AttachmentIndex:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES, max_workers: int = 8,
+                 hash_files: bool = True, log=default_log):
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.hash_files = hash_files
+        self.log = log
+        self.files = {}
+        self.cells = {}
+
+    def add_cells(self, cells):
+        new_cells = [cell for cell in cells if cell not in self.cells]
+        if not new_cells:
+            return
+        parsed = {cell: split_attachment_cell(cell) for cell in new_cells}
+        new_paths = list(dict.fromkeys(path for paths in parsed.values() for path in paths if path not in self.files))
+        if new_paths:
+            self.log(f"Indexing {len(new_paths)} new attachment path(s).", logging.DEBUG)
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(new_paths)))) as executor:
+                for info in executor.map(lambda p: inspect_file(p, self.hash_files), new_paths):
+                    self.files[info.path] = info
+                    if not info.exists:
+                        self.log(f"Attachment file not found: {info.path}", logging.WARNING)
+                    elif info.error:
+                        self.log(f"Attachment file unreadable: {info.path} ({info.error})", logging.WARNING)
+                    elif self.max_bytes and info.size > self.max_bytes:
+                        self.log(f"Attachment file too large: {info.path} ({_megabytes(info.size)})", logging.WARNING)
+        for cell, paths in parsed.items():
+            self.cells[cell] = self._resolve_paths(paths)
+
+    def _resolve_paths(self, paths) -> ResolvedAttachments:
+        if not paths:
+            return ResolvedAttachments((), (), "No valid attachments specified.", 0)
+        infos = []
+        notes = []
+        for path in paths:
+            info = self.files[path]
+            if info.exists and not info.error:
+                infos.append(info)
+                notes.append(f"Attached: {info.name}")
+            elif info.exists:
+                notes.append(f"ERROR attaching: {info.name}")
+            else:
+                notes.append(f"NOT FOUND: {info.name}")
+        total_size = sum(info.size for info in infos)
+        problem = ""
+        if self.max_bytes:
+            oversized = [info for info in infos if info.size > self.max_bytes]
+            if oversized:
+                problem = "Attachment too large: " + ", ".join(f"{info.name} ({_megabytes(info.size)})" for info in oversized)
+            elif total_size > self.max_bytes:
+                problem = f"Attachments exceed {_megabytes(self.max_bytes)} in total ({_megabytes(total_size)})"
+        return ResolvedAttachments(tuple(info.path for info in infos), tuple(infos), "\n".join(notes), total_size, problem)
+
+    def problems(self) -> dict:
+        return {cell: resolved.problem for cell, resolved in self.cells.items() if resolved.problem}
+
+    def resolve(self, cell) -> ResolvedAttachments:
+        if not isinstance(cell, str) or not cell:
+            return NO_ATTACHMENTS
+        resolved = self.cells.get(cell)
+        if resolved is None:
+            self.add_cells([cell])
+            resolved = self.cells[cell]
+        return resolved
@@ -0,0 +1,339 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from attachments import DEFAULT_MAX_ATTACHMENT_BYTES, AttachmentIndex
+from journal import SendJournal, campaign_key, row_key
+from logpipeline import default_log
+from metrics import BatchMetrics, build_report, write_json_report, write_prometheus
+from scheduler import DeliveryScheduler, RetryPolicy
+from recipients import DEFAULT_CHUNK_SIZE, RecipientFileError, open_recipients
+from signature import PreparedSignature
+from templates import TemplateError, compile_body
+from transports import OutgoingMessage, TransportError
+
+SENT, SKIPPED, FAILED = "sent", "skipped", "failed"
+
+
+class BatchError(Exception):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+
+
+@dataclass
+class BatchJob:
+    excel_path: str
+    subject: str
+    body_html: str
+    cc: str = ""
+    signature: PreparedSignature = PreparedSignature()
+    preview: bool = False
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    dedupe: bool = True
+    rejected_report_path: str = ""
+    max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES
+    journal_path: str = ""
+    resume: bool = True
+    rate_limit: float = 0.0
+    max_retries: int = 4
+    report_path: str = ""
+    prometheus_path: str = ""
+
+
+@dataclass
+class RowResult:
+    row_number: int
+    email: str
+    status: str
+    detail: str = ""
+    key: str = ""
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    sent: int = 0
+    skipped: int = 0
+    failed: int = 0
+    rejected: int = 0
+    already_sent: int = 0
+    cancelled: bool = False
+    rejected_report: str = ""
+    report: str = ""
+
+    @property
+    def processed(self):
+        return self.sent + self.skipped + self.failed
+
+
+def load_recipients(excel_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    try:
+        return open_recipients(excel_path, chunk_size)
+    except RecipientFileError as e:
+        raise BatchError("Excel Error", f"Failed to read the Excel file.\nError: {e}") from e
+
+
+def write_batch_report(job: BatchJob, summary: BatchSummary, metrics, elapsed, started_at, transport_name,
+                       log=default_log, **extra):
+    report = build_report(summary, metrics, elapsed, transport_name, started_at,
+                          recipients_file=os.path.basename(job.excel_path), **extra)
+    timings = ", ".join(
+        f"{stage} {stats['p50_seconds'] * 1000:.2f}/{stats['p95_seconds'] * 1000:.2f}/{stats['p99_seconds'] * 1000:.2f}"
+        for stage, stats in report["stages"].items()
+    )
+    log(f"Batch took {elapsed:.1f}s ({report['throughput_per_second']:.1f} sent/s). "
+        f"Stage p50/p95/p99 ms: {timings}", logging.INFO)
+    for path, write in ((job.report_path, write_json_report), (job.prometheus_path, write_prometheus)):
+        if not path:
+            continue
+        try:
+            write(path, report)
+        except OSError as e:
+            log(f"Could not write batch report {path}: {e}", logging.WARNING)
+            continue
+        if path == job.report_path:
+            summary.report = path
+
+
+class BatchRunner:
+    def __init__(self, job: BatchJob, transport, log=default_log, on_progress=None, on_result=None, confirm=None,
+                 metrics=None):
+        self.job = job
+        self.transport = transport
+        self.log = log
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.confirm = confirm
+        self.summary = BatchSummary()
+        self.metrics = metrics if metrics is not None else BatchMetrics()
+        self.attachments = AttachmentIndex(job.max_attachment_bytes, log=log)
+        self.journal = None
+        self.body_template = None
+        self.campaign = campaign_key(job.body_html, job.signature.html)
+        self.scheduler = None
+        self._completed = set()
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancel = threading.Event()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def cancel(self):
+        self._cancel.set()
+        self._resume.set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self) -> BatchSummary:
+        name = self.transport.name
+        started_at = time.time()
+        started = time.perf_counter()
+        self.transport.metrics = self.metrics
+        try:
+            self.log(f"Initializing {name} delivery.", logging.DEBUG)
+            with self.metrics.stage("connect"):
+                self.transport.open()
+        except Exception as e:
+            self.log(f"CRITICAL: Could not connect to {name}. Error: {e}", logging.ERROR)
+            raise BatchError(f"{name} Error", f"Could not connect to {name}.\nError: {e}") from e
+        try:
+            summary = self._run()
+        finally:
+            self.transport.close()
+        self._write_report(time.perf_counter() - started, started_at)
+        return summary
+
+    def _write_report(self, elapsed, started_at):
+        if not self.job.report_path and not self.job.prometheus_path:
+            # No report wanted, as in a delivery session whose parent merges the timings and reports once.
+            return
+        write_batch_report(self.job, self.summary, self.metrics, elapsed, started_at, self.transport.name, self.log,
+                           retries=self.scheduler.retries if self.scheduler is not None else 0)
+
+    def _run(self):
+        # pandas is only needed once a batch starts, so keep it out of application start-up.
+        from preflight import Preflight, PreflightError, RejectedReport
+        job = self.job
+        try:
+            preflight = Preflight(job.subject, job.cc, dedupe=job.dedupe, attachment_index=self.attachments)
+            self.body_template = compile_body(job.body_html, job.signature.html)
+        except (PreflightError, TemplateError) as e:
+            self.log(f"ERROR in pre-flight checks: {e}", logging.ERROR)
+            raise BatchError("Pre-flight Error", str(e)) from e
+        try:
+            stream = load_recipients(job.excel_path, job.chunk_size)
+        except BatchError as e:
+            self.log(f"ERROR reading Excel file: {e.__cause__}", logging.ERROR)
+            raise
+        templates = (preflight.subject_template, self.body_template)
+        unknown = list(dict.fromkeys(column for template in templates for column in template.missing(stream.columns)))
+        defaulted = [column for template in templates for column in template.missing(stream.columns, with_defaults=True)
+                     if column not in unknown]
+        if defaulted:
+            self.log(f"No column for placeholder(s) {', '.join(dict.fromkeys(defaulted))}; their defaults will be used.",
+                     logging.WARNING)
+        if unknown:
+            stream.close()
+            names = ", ".join(f"{{{{{column}}}}}" for column in unknown)
+            self.log(f"ERROR in pre-flight checks: unknown placeholder(s) {names}", logging.ERROR)
+            raise BatchError("Template Error", f"The subject or body uses placeholder(s) with no matching column in the "
+                                               f"Excel file:\n{names}\n\nAvailable columns: {', '.join(stream.columns)}")
+        if job.journal_path:
+            try:
+                self.journal = SendJournal(job.journal_path)
+                if self.transport.max_in_flight == 1:
+                    # One message at a time gains nothing from batching commits, so every row is committed as it lands.
+                    self.journal.flush_every = 1
+                self.journal.open()
+                if job.resume:
+                    self._completed = self.journal.completed_keys()
+                    if self._completed:
+                        self.log(f"Resuming: {len(self._completed)} message(s) already sent according to {job.journal_path}.", logging.INFO)
+            except Exception as e:
+                stream.close()
+                if self.journal is not None:
+                    self.journal.close()
+                self.log(f"ERROR opening send journal: {e}", logging.ERROR)
+                raise BatchError("Journal Error", f"Could not open the send journal.\nError: {e}") from e
+        with stream:
+            self.summary.total = stream.total_hint or 0
+            total_label = stream.total_hint if stream.total_hint is not None else "an unknown number of"
+            self.log(f"Starting email batch for {total_label} records. Preview mode: {job.preview}", logging.INFO)
+            report = RejectedReport(job.rejected_report_path)
+            try:
+                self._send_chunks(stream, preflight, report)
+            except RecipientFileError as e:
+                self.log(f"ERROR reading Excel file: {e}", logging.ERROR)
+                raise BatchError("Excel Error", f"Failed to read the Excel file.\nError: {e}") from e
+            finally:
+                report.close()
+                if self.journal is not None:
+                    self.journal.close()
+            if report.count:
+                self.summary.rejected_report = report.path
+                self.log(f"{report.count} row(s) rejected during pre-flight checks. Report: {report.path}", logging.WARNING)
+            if not self.summary.cancelled:
+                self.summary.total = stream.rows_read
+        return self.summary
+
+    def _send_chunks(self, stream, preflight, report):
+        metrics = self.metrics
+        self.scheduler = DeliveryScheduler(self.transport, self.job.rate_limit, RetryPolicy(self.job.max_retries), self.log,
+                                           metrics=metrics)
+        try:
+            loading = time.perf_counter()
+            for chunk in stream:
+                metrics.observe("load", time.perf_counter() - loading)
+                with metrics.stage("preflight"):
+                    plan, rejected = preflight.plan_rows(chunk)
+                report.write(rejected)
+                for rejected_row in rejected:
+                    self.summary.rejected += 1
+                    self._record(RowResult(rejected_row.row_number, rejected_row.email, SKIPPED, rejected_row.reason),
+                                 f"Skipping row {rejected_row.row_number}: {rejected_row.reason}", logging.WARNING)
+                for planned in plan:
+                    if not self._process_row(planned):
+                        return
+                loading = time.perf_counter()
+        finally:
+            for context, error in self.scheduler.drain(cancelled=self.cancelled):
+                self._collect(context, error)
+
+    def _process_row(self, planned):
+        job = self.job
+        if self.paused and self.journal is not None:
+            self.journal.flush()
+        self._resume.wait()
+        if self._cancel.is_set():
+            self.summary.cancelled = True
+            self.log("Batch cancelled by user; finishing in-flight messages.", logging.WARNING)
+            return False
+        row_number = planned.row_number
+        email_address = planned.to
+        key = row_key(email_address, planned.subject, planned.attachment, self.campaign)
+        if key in self._completed:
+            self.summary.already_sent += 1
+            self._record(RowResult(row_number, email_address, SKIPPED, "already sent in a previous run"),
+                         f"SKIPPED row {row_number}: {email_address} was already sent in a previous run.")
+            return True
+        self.log(f"Processing row {row_number} for recipient: {email_address}", logging.DEBUG)
+        try:
+            draft, attachment_note = self._prepare(planned)
+            if job.preview:
+                self.transport.display(draft)
+                if self.confirm is not None and self.confirm(email_address, attachment_note):
+                    with self.metrics.stage("send"):
+                        self.transport.submit(draft)
+                    self._record(RowResult(row_number, email_address, SENT, "after preview", key),
+                                 f"SENT (after preview) to {email_address}")
+                else:
+                    self._record(RowResult(row_number, email_address, SKIPPED, "declined in preview", key),
+                                 f"SKIPPED (after preview) sending to {email_address} by user.")
+            else:
+                self.scheduler.submit(draft, (row_number, email_address, key), email_address)
+                for context, error in self.scheduler.poll():
+                    self._collect(context, error)
+        except Exception as e:
+            self._record_failure(row_number, email_address, e, key)
+        return True
+
+    def _prepare(self, planned):
+        job = self.job
+        metrics = self.metrics
+        email_address = planned.to
+        with metrics.stage("render"):
+            final_html_body = self.body_template.render(planned.row)
+        resolved = self.attachments.resolve(planned.attachment)
+        if resolved.paths:
+            self.log(f"Attaching for '{email_address}': {', '.join(resolved.paths)}", logging.INFO)
+        message = OutgoingMessage(
+            to=email_address, cc=planned.cc, subject=planned.subject, html_body=final_html_body,
+            attachments=list(resolved.paths), inline_images=job.signature.inline_images,
+            attachment_infos=list(resolved.infos),
+        )
+        with metrics.stage("prepare"):
+            draft = self.transport.prepare(message)
+        self.log(f"Final HTMLBody set for {email_address}.", logging.DEBUG)
+        return draft, resolved.note
+
+    def _collect(self, context, error):
+        row_number, email_address, key = context
+        if error is not None:
+            self._record_failure(row_number, email_address, error, key)
+            return
+        self._record(RowResult(row_number, email_address, SENT, key=key), f"SENT to {email_address}")
+
+    def _record_failure(self, row_number, email_address, error, key=""):
+        if isinstance(error, TransportError):
+            message = f"A {self.transport.name} error occurred for {email_address}: {error}"
+        else:
+            message = f"An unexpected error occurred for {email_address}: {error}"
+        self._record(RowResult(row_number, email_address, FAILED, str(error), key), message, logging.ERROR)
+
+    def _record(self, result: RowResult, message, level=logging.INFO):
+        if result.status == SENT:
+            self.summary.sent += 1
+        elif result.status == SKIPPED:
+            self.summary.skipped += 1
+        else:
+            self.summary.failed += 1
+        if result.key and self.journal is not None:
+            self.journal.record(result.key, result.row_number, result.email, result.status, result.detail)
+        self.log(message, level)
+        if self.on_result is not None:
+            self.on_result(result)
+        if self.on_progress is not None:
+            self.on_progress(self.summary.processed, max(self.summary.total, self.summary.processed))
@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import SendJournal, row_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-row cost of the send journal.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.mailops-journal.sqlite")
+        keys = [row_key(f"user{i}@example.com", "Quarterly pricing update") for i in range(args.rows)]
+        start = time.perf_counter()
+        with SendJournal(path) as journal:
+            for i, key in enumerate(keys):
+                journal.record(key, i + 2, f"user{i}@example.com", "sent")
+        write = time.perf_counter() - start
+        start = time.perf_counter()
+        with SendJournal(path) as journal:
+            completed = journal.completed_keys()
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        hits = sum(key in completed for key in keys)
+        lookup = time.perf_counter() - start
+    print(f"record   rows={args.rows:<8} {write:8.3f}s  {write / args.rows * 1e6:8.2f} us/row")
+    print(f"resume   load={load:8.3f}s  lookup={lookup / args.rows * 1e6:6.3f} us/row  hits={hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QTextEdit
+
+from logpipeline import CONSOLE_FORMAT, FILE_FORMAT, LogPipeline
+
+
+def log_rows(rows, flush=None, flush_every=0):
+    # The same lines BatchRunner writes for a row: two DEBUG, one INFO attachment note and one INFO result.
+    for i in range(rows):
+        email = f"user{i}@example.com"
+        logging.debug(f"Processing row {i + 2} for recipient: {email}")
+        logging.info(f"Attaching for '{email}': C:\\Quotes\\Q-{i}.pdf")
+        logging.debug(f"Final HTMLBody set for {email}.")
+        logging.info(f"SUCCESS: Email sent to {email}.")
+        if flush and i % flush_every == 0:
+            flush()
+
+
+class AppendHandler(logging.Handler):
+    def __init__(self, view):
+        super().__init__(logging.INFO)
+        self.view = view
+        self.setFormatter(logging.Formatter('%(asctime)s - %(message)s', '%H:%M:%S'))
+
+    def emit(self, record):
+        self.view.append(self.format(record))
+
+
+def run_synchronous(path, rows, view):
+    root = logging.getLogger()
+    file_handler = logging.FileHandler(path, mode='w', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers = [file_handler, console_handler, AppendHandler(view)]
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    try:
+        start = time.perf_counter()
+        log_rows(rows)
+        return time.perf_counter() - start
+    finally:
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+
+
+def run_pipeline(path, rows, view, flush_every):
+    pipeline = LogPipeline(path, ui_capacity=5000).start()
+    view.document().setMaximumBlockCount(5000)
+    flushes = []
+
+    def flush():
+        started = time.perf_counter()
+        lines, dropped = pipeline.ui_buffer.drain()
+        if lines:
+            cursor = view.textCursor()
+            cursor.movePosition(cursor.MoveOperation.End)
+            cursor.insertText(("" if view.document().isEmpty() else "\n") + "\n".join(lines))
+        flushes.append(time.perf_counter() - started)
+
+    try:
+        start = time.perf_counter()
+        log_rows(rows, flush, flush_every)
+        elapsed = time.perf_counter() - start
+    finally:
+        pipeline.stop()
+    flush()
+    return elapsed, sum(flushes), len(flushes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-row logging overhead, including the log view.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--flush-every", type=int, default=250,
+                        help="rows between log view flushes (roughly one 100 ms timer tick)")
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication([])
+    stderr = sys.stderr
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        sys.stderr = devnull
+        try:
+            sync_elapsed = run_synchronous(os.path.join(directory, "sync.log"), args.rows, QTextEdit())
+            pipe_elapsed, flush_time, flush_count = run_pipeline(os.path.join(directory, "pipeline.log"), args.rows,
+                                                                  QTextEdit(), args.flush_every)
+        finally:
+            sys.stderr = stderr
+    print(f"per-line append  rows={args.rows:<8} {sync_elapsed:7.3f}s  {sync_elapsed / args.rows * 1e6:8.1f} us/row")
+    print(f"pipeline         rows={args.rows:<8} {pipe_elapsed:7.3f}s  {pipe_elapsed / args.rows * 1e6:8.1f} us/row"
+          f"  ({flush_count} view flushes, {flush_time:.3f}s total)")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attachments import inspect_file
+from smtp_sink import SmtpSink
+from transports import InlineImage, OutgoingMessage, SmtpSettings, SmtpTransport
+
+BODY_HTML = "<p>Hi there,</p>" + "<p>Please find our updated pricing for the coming quarter.</p>" * 60
+MB = 1024 * 1024
+
+
+def write_fixtures(directory, files, file_kb, large_mb):
+    attachments = []
+    for i in range(files):
+        path = os.path.join(directory, f"Quote-{i:02d}.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(file_kb * 1024))
+        attachments.append(path)
+    large = ""
+    if large_mb:
+        large = os.path.join(directory, "Catalogue.pdf")
+        with open(large, "wb") as f:
+            for _ in range(large_mb):
+                f.write(os.urandom(MB))
+    image = os.path.join(directory, "image001.png")
+    with open(image, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + os.urandom(24 * 1024))
+    return attachments, large, image
+
+
+def messages(rows, attachments, large, image, large_every):
+    # Built the way BatchRunner builds them: signature image read and hashed once, attachment infos from pre-flight.
+    with open(image, "rb") as f:
+        data = f.read()
+    signature_image = InlineImage("image001.png@mailops", image, data, hashlib.sha256(data).hexdigest())
+    infos = {path: inspect_file(path) for path in attachments + ([large] if large else [])}
+    for i in range(rows):
+        paths = [attachments[i % len(attachments)], attachments[(i + 7) % len(attachments)]]
+        if large and large_every and i % large_every == 0:
+            paths.append(large)
+        yield OutgoingMessage(to=f"user{i}@example.com", subject=f"Quarterly pricing {i}", html_body=BODY_HTML,
+                              attachments=paths, inline_images=[signature_image],
+                              attachment_infos=[infos[path] for path in paths])
+
+
+def drain(payload) -> int:
+    # Walks the payload the way the socket would see it, so deferred (streamed) encoding is counted too.
+    if isinstance(payload, bytes):
+        return len(payload)
+    return sum(len(chunk) for chunk in payload.chunks())
+
+
+def run_build(transport, stream, in_flight):
+    pending = deque()
+    encoded = 0
+    for message in stream:
+        pending.append(transport.prepare(message)[2])
+        if len(pending) > in_flight:
+            encoded += drain(pending.popleft())
+    while pending:
+        encoded += drain(pending.popleft())
+    return encoded
+
+
+def run_sink(transport, stream):
+    pending = deque()
+    for message in stream:
+        pending.append(transport.submit_async(transport.prepare(message)))
+        while len(pending) >= transport.max_in_flight:
+            pending.popleft().result()
+    while pending:
+        pending.popleft().result()
+
+
+def cache_stats(transport):
+    cache = getattr(getattr(transport, "builder", None), "cache", None)
+    if cache is None:
+        return "-"
+    return f"hits={cache.hits} misses={cache.misses} evictions={cache.evictions} cached={cache.bytes / MB:.1f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SMTP message building for rows that share bodies and attachments.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=10, help="distinct attachment files shared across rows")
+    parser.add_argument("--file-kb", type=int, default=2048, help="size of each shared attachment")
+    parser.add_argument("--large-mb", type=int, default=32, help="one large attachment, streamed (0 to skip)")
+    parser.add_argument("--large-every", type=int, default=100, help="attach the large file to every Nth row")
+    parser.add_argument("--cache-mb", type=int, default=64, help="MIME part cache budget")
+    parser.add_argument("--sink-rows", type=int, default=200, help="rows for the end-to-end run against the local sink")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc-instrumented build pass")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        attachments, large, image = write_fixtures(directory, args.files, args.file_kb, args.large_mb)
+        shared = args.files * args.file_kb / 1024
+        print(f"{args.files} shared attachments ({shared:.0f} MB) + {args.large_mb} MB file every {args.large_every} rows, "
+              f"cache budget {args.cache_mb} MB")
+        settings = SmtpSettings(sender="bench@example.com", pool_size=4, mime_cache_bytes=args.cache_mb * MB)
+
+        transport = SmtpTransport(settings)
+        start = time.perf_counter()
+        encoded = run_build(transport, messages(args.rows, attachments, large, image, args.large_every), 8)
+        elapsed = time.perf_counter() - start
+        print(f"build  rows={args.rows:<6} {args.rows / elapsed:8.1f} msg/s {encoded / MB / elapsed:8.1f} MB/s  "
+              f"{cache_stats(transport)}")
+        if not args.no_memory:
+            transport = SmtpTransport(settings)
+            tracemalloc.start()
+            run_build(transport, messages(args.rows, attachments, large, image, args.large_every), 8)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"build  peak traced memory {peak / MB:.1f} MB")
+
+        with SmtpSink() as sink:
+            settings.host, settings.port = sink.host, sink.port
+            transport = SmtpTransport(settings)
+            start = time.perf_counter()
+            with transport:
+                run_sink(transport, messages(args.sink_rows, attachments, large, image, args.large_every))
+            elapsed = time.perf_counter() - start
+            print(f"sink   rows={args.sink_rows:<6} {args.sink_rows / elapsed:8.1f} msg/s {sink.bytes / MB / elapsed:8.1f} MB/s  "
+                  f"{cache_stats(transport)}")
+
+
+if __name__ == "__main__":
+    main()
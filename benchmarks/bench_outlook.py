@@ -0,0 +1,120 @@
+import argparse
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preflight  # noqa: F401 - BatchRunner imports pandas lazily; keep that out of the first timed batch
+from batch import BatchJob, BatchRunner
+from fakes import FakeComError, FakeOutlook
+from signature import PreparedSignature, SignatureCache, signature_files_dir
+from transports import OutlookTransport
+
+VARIANTS = {
+    "plain": (False, False),
+    "images": (True, False),
+    "attachments": (False, True),
+    "images+attachments": (True, True),
+}
+BODY_HTML = "<p>" + "Please find our updated pricing for the coming quarter. " * 180 + "</p>"
+ATTACHMENT_FILES = 20
+ATTACHMENT_BYTES = 200 * 1024
+IMAGE_BYTES = 24 * 1024
+
+
+def write_fixtures(directory, rows):
+    attachments = []
+    for i in range(ATTACHMENT_FILES):
+        path = os.path.join(directory, f"Quote-{i:02d}.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(ATTACHMENT_BYTES))
+        attachments.append(path)
+    recipients = os.path.join(directory, "recipients.csv")
+    with open(recipients, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Email", "Greeting", "Supplier Name", "Attachment"])
+        for i in range(rows):
+            cell = attachments[i % ATTACHMENT_FILES]
+            if i % 5 == 0:
+                cell += ";" + attachments[(i + 7) % ATTACHMENT_FILES]
+            writer.writerow([f"user{i}@example.com", "Hi there," if i % 3 else "", "Acme Corp" if i % 2 else "", cell])
+    plain = os.path.join(directory, "recipients-plain.csv")
+    with open(recipients, encoding="utf-8") as source, open(plain, "w", encoding="utf-8", newline="") as target:
+        for line in source:
+            target.write(line.rsplit(",", 1)[0] + "\n")
+    sig_dir = os.path.join(directory, "Signatures")
+    os.makedirs(os.path.join(sig_dir, "Sig_files"))
+    for name in ("image001.png", "image002.png"):
+        with open(os.path.join(sig_dir, "Sig_files", name), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + os.urandom(IMAGE_BYTES))
+    sig_path = os.path.join(sig_dir, "Sig.htm")
+    with open(sig_path, "w", encoding="utf-8") as f:
+        f.write('<div><p>Jane Doe<br>Sales</p><img src="Sig_files/image001.png"><img src="Sig_files/image002.png"></div>')
+    return recipients, plain, sig_path
+
+
+def run_batch(recipients, signature, latency, html_latency_per_mb):
+    outlook = FakeOutlook(latency, html_latency_per_mb)
+    job = BatchJob(excel_path=recipients, subject="Quarterly pricing", body_html=BODY_HTML, signature=signature)
+    runner = BatchRunner(job, OutlookTransport(application=outlook, com_error=FakeComError))
+    start = time.perf_counter()
+    summary = runner.run()
+    return summary, time.perf_counter() - start, outlook
+
+
+def percentile_ms(samples, q):
+    if len(samples) < 2:
+        return samples[0] * 1000 if samples else 0.0
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000
+
+
+def parse_latency(values):
+    latency = {}
+    for value in values:
+        operation, _, seconds = value.partition("=")
+        if operation not in FakeOutlook.OPERATIONS or not seconds:
+            raise argparse.ArgumentTypeError(f"expected OPERATION=SECONDS with OPERATION in {', '.join(FakeOutlook.OPERATIONS)}")
+        latency[operation] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run synthetic Outlook batches against an in-process fake COM server.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000], help="batch sizes, e.g. 1000 10000 100000")
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--latency", nargs="*", default=[], metavar="OP=SECONDS",
+                        help=f"simulated COM latency per call ({', '.join(FakeOutlook.OPERATIONS)})")
+    parser.add_argument("--html-latency-per-mb", type=float, default=0.0, help="simulated HTMLBody cost in seconds per MB")
+    parser.add_argument("--no-memory", action="store_true", help="skip the second, tracemalloc-instrumented pass")
+    args = parser.parse_args()
+    latency = parse_latency(args.latency)
+    print(f"{'rows':>7} {'variant':<19} {'msgs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak MB':>8}  COM calls")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            recipients, plain, sig_path = write_fixtures(directory, rows)
+            images = SignatureCache().get(sig_path, signature_files_dir(sig_path), lambda *a: None)
+            no_images = PreparedSignature(html="<div><p>Jane Doe<br>Sales</p></div>")
+            for variant in args.variants:
+                with_images, with_attachments = VARIANTS[variant]
+                source = recipients if with_attachments else plain
+                signature = images if with_images else no_images
+                summary, elapsed, outlook = run_batch(source, signature, latency, args.html_latency_per_mb)
+                peak = ""
+                if not args.no_memory:
+                    tracemalloc.start()
+                    run_batch(source, signature, latency, args.html_latency_per_mb)
+                    peak = f"{tracemalloc.get_traced_memory()[1] / (1024 * 1024):8.1f}"
+                    tracemalloc.stop()
+                samples = outlook.send_latencies
+                calls = " ".join(f"{name}={count}" for name, count in sorted(outlook.calls.items()))
+                print(f"{rows:>7} {variant:<19} {summary.sent / elapsed:9.0f} {percentile_ms(samples, 50):8.3f} "
+                      f"{percentile_ms(samples, 95):8.3f} {percentile_ms(samples, 99):8.3f} {peak:>8}  {calls}")
+
+
+if __name__ == "__main__":
+    main()
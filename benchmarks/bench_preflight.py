@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preflight import EMAIL_RE, Preflight
+from recipients import RecipientRow
+
+
+def synthetic_table(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    ids = rng.integers(0, rows, size=rows)
+    emails = np.char.add(np.char.add("user", ids.astype(str)), "@example.com").astype(object)
+    emails[rng.random(rows) < 0.01] = "not-an-address"
+    emails[rng.random(rows) < 0.01] = ""
+    return pd.DataFrame({
+        "Email": emails,
+        "Greeting": np.where(rng.random(rows) < 0.7, "Hi there,", ""),
+        "Supplier Name": np.where(rng.random(rows) < 0.5, "Acme Corp", ""),
+        "Attachment": "",
+        "CC": np.where(rng.random(rows) < 0.2, "cc1@example.com; cc2@example.com", ""),
+    })
+
+
+def per_row(df: pd.DataFrame, subject: str):
+    planned = 0
+    for index, row in df.iterrows():
+        email_address = str(row['Email']).strip()
+        if not email_address or not EMAIL_RE.fullmatch(email_address):
+            continue
+        supplier_name = str(row.get('Supplier Name', '')).strip()
+        final_subject = f"{supplier_name} - {subject}" if supplier_name else subject
+        greeting = str(row['Greeting']).strip()
+        greeting_html_part = f"<p>{greeting.rstrip(',')}," + "</p>" if greeting else ""
+        planned += 1
+    return planned
+
+
+def vectorized(df: pd.DataFrame, subject: str):
+    plan, rejected = Preflight(subject, "boss@example.com").plan(df)
+    return len(plan)
+
+
+def chunked(df: pd.DataFrame, subject: str, chunk_size: int):
+    records = [RecipientRow(i + 2, values) for i, values in enumerate(df.to_dict("records"))]
+    preflight = Preflight(subject, "boss@example.com")
+    planned = 0
+    start = time.perf_counter()
+    for offset in range(0, len(records), chunk_size):
+        plan, rejected = preflight.plan_rows(records[offset:offset + chunk_size])
+        planned += len(plan)
+    return planned, time.perf_counter() - start
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row rendering/validation with the vectorized pre-flight pass.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    df = synthetic_table(args.rows)
+    subject = "Quarterly pricing update"
+    _, baseline = timed(per_row, df, subject)
+    print(f"per-row iterrows     rows={args.rows:<8} {baseline:8.3f}s  {args.rows / baseline:12.0f} rows/s")
+    planned, elapsed = timed(vectorized, df, subject)
+    print(f"vectorized (table)   rows={args.rows:<8} {elapsed:8.3f}s  {args.rows / elapsed:12.0f} rows/s  x{baseline / elapsed:.1f}  planned={planned}")
+    for chunk_size in (500, 2000, 5000):
+        planned, elapsed = chunked(df, subject, chunk_size)
+        print(f"vectorized (chunk={chunk_size:<5}) rows={args.rows:<8} {elapsed:8.3f}s  {args.rows / elapsed:12.0f} rows/s  x{baseline / elapsed:.1f}  planned={planned}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import ThrottlingTransport
+from scheduler import DeliveryScheduler, RetryPolicy
+from transports import OutgoingMessage
+
+# --check: an unlimited start against a server that accepts CHECK_CAPACITY msg/s must settle near that rate.
+CHECK_MESSAGES = 1000
+CHECK_CAPACITY = 100.0
+CHECK_MAX_THROTTLED = 0.1  # fraction of messages
+CHECK_MAX_SLOWDOWN = 1.3  # elapsed time against messages / capacity
+# and a few recipients that always defer (greylisting) must not slow everyone else down.
+GREYLIST_MESSAGES = 400
+GREYLISTED = 5
+GREYLIST_MAX_SECONDS = 1.0
+
+
+def run(messages: int, capacity: float, rate_limit: float, adaptive: bool, quiet_log, retry: RetryPolicy = None,
+        greylisted=()):
+    transport = ThrottlingTransport(capacity=capacity, burst=capacity / 5, greylisted=greylisted)
+    if retry is None:
+        retry = RetryPolicy(max_retries=6, base_delay=0.05, max_delay=2.0) if adaptive else RetryPolicy(max_retries=0)
+    delivered = failed = 0
+    start = time.perf_counter()
+    with transport:
+        scheduler = DeliveryScheduler(transport, rate_limit, retry, log=quiet_log)
+        for i in range(messages):
+            message = OutgoingMessage(to=f"user{i}@example.com", subject="Benchmark", html_body="<p>Hi</p>")
+            scheduler.submit(transport.prepare(message), i, message.to)
+            for _, error in scheduler.poll():
+                delivered += error is None
+                failed += error is not None
+        for _, error in scheduler.drain():
+            delivered += error is None
+            failed += error is not None
+    elapsed = time.perf_counter() - start
+    return delivered, failed, scheduler.retries, transport.throttled, scheduler.bucket.rate, elapsed
+
+
+def check(quiet_log) -> int:
+    # Uses the scheduler's default retry policy, as a real batch would.
+    delivered, failed, retries, throttled, rate, elapsed = run(CHECK_MESSAGES, CHECK_CAPACITY, 0.0, True, quiet_log,
+                                                               RetryPolicy())
+    ideal = CHECK_MESSAGES / CHECK_CAPACITY
+    print(f"check: delivered={delivered} lost={failed} throttled={throttled} {elapsed:.2f}s (ideal {ideal:.1f}s)")
+    problems = []
+    if delivered != CHECK_MESSAGES:
+        problems.append(f"{CHECK_MESSAGES - delivered} messages were not delivered")
+    if throttled > CHECK_MESSAGES * CHECK_MAX_THROTTLED:
+        problems.append(f"{throttled} throttled sends, limit {CHECK_MESSAGES * CHECK_MAX_THROTTLED:.0f}")
+    if elapsed > ideal * CHECK_MAX_SLOWDOWN:
+        problems.append(f"took {elapsed:.2f}s, limit {ideal * CHECK_MAX_SLOWDOWN:.1f}s")
+
+    greylisted = {f"user{i}@example.com" for i in range(0, GREYLIST_MESSAGES, GREYLIST_MESSAGES // GREYLISTED)}
+    delivered, failed, retries, throttled, rate, elapsed = run(
+        GREYLIST_MESSAGES, 1e6, 0.0, True, quiet_log, RetryPolicy(max_retries=4, base_delay=0.01, max_delay=0.05),
+        greylisted,
+    )
+    print(f"check: {len(greylisted)} greylisted of {GREYLIST_MESSAGES}: delivered={delivered} lost={failed} "
+          f"retries={retries} {elapsed:.2f}s")
+    if delivered != GREYLIST_MESSAGES - len(greylisted):
+        problems.append(f"{GREYLIST_MESSAGES - len(greylisted) - delivered} deliverable messages were not delivered")
+    if elapsed > GREYLIST_MAX_SECONDS:
+        problems.append(f"greylisted recipients slowed the batch to {elapsed:.2f}s, limit {GREYLIST_MAX_SECONDS:.1f}s")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the delivery scheduler against a fake transport that throttles.")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--capacity", type=float, default=400.0, help="Messages per second the fake server accepts.")
+    parser.add_argument("--check", action="store_true",
+                        help="Assert that an unlimited start settles with few throttled sends; exits non-zero if not.")
+    args = parser.parse_args()
+    quiet_log = lambda message, level=logging.INFO: None
+    if args.check:
+        sys.exit(check(quiet_log))
+    for label, rate_limit, adaptive in (("no scheduler retries", 0.0, False), ("adaptive, unlimited start", 0.0, True),
+                                        ("adaptive, 2x capacity cap", args.capacity * 2, True)):
+        delivered, failed, retries, throttled, rate, elapsed = run(args.messages, args.capacity, rate_limit, adaptive, quiet_log)
+        final_rate = f"{rate:.0f}/s" if rate > 0 else "unlimited"
+        print(f"{label:<28} delivered={delivered:<6} lost={failed:<6} retries={retries:<6} throttled={throttled:<6} "
+              f"final_rate={final_rate:<10} {elapsed:6.2f}s  {delivered / elapsed:8.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preflight  # noqa: F401 - BatchRunner imports pandas lazily; keep that out of the first timed batch
+from batch import BatchJob, BatchRunner
+from fakes import fake_outlook_transport
+from shards import ShardedBatchRunner
+from signature import PreparedSignature
+from smtp_sink import SmtpSink
+from transports import SmtpSettings, TransportSpec
+
+BODY_HTML = "<p>" + "Please find our updated pricing for the coming quarter. " * 40 + "</p>"
+
+
+def write_recipients(directory, rows):
+    path = os.path.join(directory, "recipients.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Email", "Greeting", "Supplier Name"])
+        for i in range(rows):
+            writer.writerow([f"user{i}@example.com", "Hi there,", "Acme Corp"])
+    return path
+
+
+def run_batch(recipients, spec, workers, directory):
+    job = BatchJob(excel_path=recipients, subject="Quarterly pricing", body_html=BODY_HTML,
+                   signature=PreparedSignature(html="<div><p>Jane Doe</p></div>"),
+                   rejected_report_path=os.path.join(directory, "rejected.csv"))
+    if workers > 1:
+        runner = ShardedBatchRunner(job, spec, workers, log=lambda *a: None)
+    else:
+        runner = BatchRunner(job, spec.create(), log=lambda *a: None)
+    start = time.perf_counter()
+    summary = runner.run()
+    return summary, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sharded multi-process sending against a single session.")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--transports", nargs="+", choices=("smtp", "outlook"), default=["smtp", "outlook"])
+    parser.add_argument("--smtp-latency", type=float, default=0.005, help="sink latency per message (seconds)")
+    parser.add_argument("--smtp-pool", type=int, default=1, help="SMTP connections per session")
+    parser.add_argument("--send-latency", type=float, default=0.002, help="fake Outlook Send latency (seconds)")
+    args = parser.parse_args()
+    print(f"{'transport':<9} {'workers':>7} {'sent':>7} {'elapsed s':>10} {'msgs/s':>9} {'speed-up':>8}")
+    with tempfile.TemporaryDirectory() as directory, SmtpSink(latency=args.smtp_latency) as sink:
+        recipients = write_recipients(directory, args.rows)
+        specs = {
+            "smtp": TransportSpec("smtp", smtp=SmtpSettings(host=sink.host, port=sink.port, sender="bench@example.com",
+                                                            starttls=False, pool_size=args.smtp_pool)),
+            "outlook": TransportSpec("outlook", factory=partial(fake_outlook_transport, {"Send": args.send_latency})),
+        }
+        for name in args.transports:
+            baseline = None
+            for workers in args.workers:
+                summary, elapsed = run_batch(recipients, specs[name], workers, directory)
+                rate = summary.sent / elapsed
+                baseline = baseline or rate
+                print(f"{name:<9} {workers:>7} {summary.sent:>7} {elapsed:10.2f} {rate:9.0f} {rate / baseline:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
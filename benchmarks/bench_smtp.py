@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_sink import SmtpSink
+from transports import OutgoingMessage, SmtpSettings, SmtpTransport
+
+
+def run(sink, messages: int, pool_size: int) -> float:
+    settings = SmtpSettings(host=sink.host, port=sink.port, sender="bench@example.com", pool_size=pool_size)
+    body = "<p>Hello,</p>" + "<p>Lorem ipsum dolor sit amet.</p>" * 40
+    start = time.perf_counter()
+    with SmtpTransport(settings) as transport:
+        pending = deque()
+        for i in range(messages):
+            message = OutgoingMessage(to=f"user{i}@example.com", subject=f"Benchmark {i}", html_body=body)
+            pending.append(transport.submit_async(transport.prepare(message)))
+            while len(pending) >= transport.max_in_flight:
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SMTP transport throughput against a local sink.")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.002, help="Simulated server latency per message (seconds).")
+    parser.add_argument("--pools", default="1,2,4,8")
+    args = parser.parse_args()
+    with SmtpSink(latency=args.latency) as sink:
+        for pool_size in (int(p) for p in args.pools.split(",")):
+            elapsed = run(sink, args.messages, pool_size)
+            print(f"pool={pool_size:<3} messages={args.messages:<7} elapsed={elapsed:8.3f}s  rate={args.messages / elapsed:9.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
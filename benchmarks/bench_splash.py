@@ -0,0 +1,52 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtWidgets import QApplication
+
+FRAME_BUDGET_MS = 1000 / 60
+
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100)[q - 1] if len(samples) > 1 else samples[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure WaveSplashScreen frame cost offscreen.")
+    parser.add_argument("--frames", type=int, default=600, help="timed frames after warm-up")
+    parser.add_argument("--warmup", type=int, default=250, help="frames run first so the particle pool is full")
+    args = parser.parse_args()
+    app = QApplication(sys.argv)  # noqa: F841 - keeps the application alive for the widgets below
+    from main import WaveSplashScreen
+    splash = WaveSplashScreen()
+    target = QImage(splash.width, splash.height, QImage.Format.Format_ARGB32_Premultiplied)
+    for _ in range(args.warmup):
+        splash._update_animation()
+    updates, paints = [], []
+    cpu_start = time.process_time()
+    for _ in range(args.frames):
+        start = time.perf_counter()
+        splash._update_animation()
+        middle = time.perf_counter()
+        painter = QPainter(target)
+        splash.render(painter)
+        painter.end()
+        end = time.perf_counter()
+        updates.append((middle - start) * 1000)
+        paints.append((end - middle) * 1000)
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / args.frames
+    frames = [u + p for u, p in zip(updates, paints)]
+    print(f"{'stage':<8} {'mean ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, samples in (("update", updates), ("paint", paints), ("frame", frames)):
+        print(f"{name:<8} {statistics.fmean(samples):8.3f} {percentile(samples, 95):8.3f} {max(samples):8.3f}")
+    print(f"CPU per frame {cpu_ms:.3f} ms, {cpu_ms / FRAME_BUDGET_MS:.0%} of one core at 60 fps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GUI_READY = """
+import time
+started = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+app = QApplication([])
+import main
+window = main._launch_with_splash()
+while not window.isVisible():
+    app.processEvents()
+print(time.perf_counter() - started)
+"""
+
+CASES = [
+    ("interpreter only", ["-c", "pass"]),
+    ("import cli (headless)", ["-c", "import cli"]),
+    ("cli.py --help", [os.path.join(ROOT, "cli.py"), "--help"]),
+    ("import main (GUI)", ["-c", "import main"]),
+    ("GUI until window is shown", ["-c", GUI_READY]),
+]
+
+
+def measure(arguments, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *arguments], cwd=directory, env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start of the headless and GUI entry points.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    for label, arguments in CASES:
+        median, best = measure(arguments, args.runs)
+        print(f"{label:<28} median {median * 1000:7.0f} ms   best {best * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transports import MailTransport, TransportError
+
+RPC_E_CALL_REJECTED = -2147418111
+
+
+class ThrottlingTransport(MailTransport):
+    name = "Fake"
+
+    def __init__(self, capacity: float = 50.0, burst: float = 10.0, latency: float = 0.002,
+                 workers: int = 4, permanent_every: int = 0, greylisted=()):
+        self.capacity = capacity
+        self.burst = burst
+        self.latency = latency
+        self.workers = workers
+        self.max_in_flight = workers * 2
+        self.permanent_every = permanent_every
+        self.greylisted = set(greylisted)
+        self.accepted = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.submitted = 0
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fake")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def prepare(self, message):
+        return message
+
+    def submit(self, draft):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.submitted += 1
+            if self.permanent_every and self.submitted % self.permanent_every == 0:
+                self.rejected += 1
+                raise TransportError("550 Mailbox unavailable")
+            if draft.to in self.greylisted:
+                self.deferred += 1
+                raise TransportError("450 4.2.0 Greylisted, try again later", transient=True)
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.capacity)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                raise TransportError("421 Too many messages, slow down", throttled=True)
+            self._tokens -= 1
+            self.accepted += 1
+
+    def submit_async(self, draft):
+        return self._executor.submit(self.submit, draft)
+
+
+class FakeComError(Exception):
+    # Same argument layout as pywintypes.com_error: (hresult, text, excepinfo, argerror).
+    def __init__(self, hresult, text, scode=None):
+        excepinfo = (0, "Microsoft Outlook", text, None, 0, scode if scode is not None else hresult)
+        super().__init__(hresult, text, excepinfo, None)
+
+
+class FakeOutlook:
+    # Stands in for the Outlook.Application surface OutlookTransport uses. latency maps an operation
+    # to seconds slept per call; html_latency_per_mb adds a cost that grows with the HTMLBody size.
+    OPERATIONS = ("CreateItem", "Recipients", "Attachments.Add", "SetProperty", "HTMLBody", "Display", "Send")
+
+    def __init__(self, latency=None, html_latency_per_mb: float = 0.0, reject_every: int = 0, record: bool = False):
+        self.latency = dict.fromkeys(self.OPERATIONS, 0.0)
+        self.latency.update(latency or {})
+        self.html_latency_per_mb = html_latency_per_mb
+        self.reject_every = reject_every
+        self.record = record
+        self.calls = Counter()
+        self.call_log = []
+        self.attached_bytes = 0
+        self.html_bytes = 0
+        self.send_latencies = []
+        self._lock = threading.Lock()
+
+    def _call(self, operation, detail=None, extra_latency: float = 0.0):
+        with self._lock:
+            self.calls[operation] += 1
+            if self.record:
+                self.call_log.append((operation, detail))
+        delay = self.latency.get(operation, 0.0) + extra_latency
+        if delay:
+            time.sleep(delay)
+
+    def CreateItem(self, item_type):
+        self._call("CreateItem", item_type)
+        return FakeMailItem(self)
+
+
+class FakeMailItem:
+    def __init__(self, outlook: FakeOutlook):
+        object.__setattr__(self, "_outlook", outlook)
+        object.__setattr__(self, "_created", time.perf_counter())
+        object.__setattr__(self, "Attachments", FakeAttachments(outlook))
+        object.__setattr__(self, "To", "")
+        object.__setattr__(self, "CC", "")
+        object.__setattr__(self, "Subject", "")
+        object.__setattr__(self, "HTMLBody", "")
+
+    def __setattr__(self, name, value):
+        outlook = self._outlook
+        if name == "HTMLBody":
+            size = len(value)
+            outlook.html_bytes += size
+            outlook._call("HTMLBody", size, outlook.html_latency_per_mb * size / (1024 * 1024))
+        elif name in ("To", "CC"):
+            outlook._call("Recipients", value)
+        elif name != "Subject":
+            raise AttributeError(f"FakeMailItem has no property {name!r}")
+        object.__setattr__(self, name, value)
+
+    def Display(self):
+        self._outlook._call("Display")
+
+    def Send(self):
+        outlook = self._outlook
+        outlook._call("Send", self.To)
+        if outlook.reject_every and outlook.calls["Send"] % outlook.reject_every == 0:
+            raise FakeComError(RPC_E_CALL_REJECTED, "Call was rejected by callee.")
+        outlook.send_latencies.append(time.perf_counter() - self._created)
+
+
+class FakeAttachments:
+    def __init__(self, outlook: FakeOutlook):
+        self._outlook = outlook
+        self.items = []
+
+    @property
+    def Count(self):
+        return len(self.items)
+
+    def Add(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            raise FakeComError(-2147024894, f"Cannot find this file. Verify the path and file name are correct: {path}")
+        self._outlook.attached_bytes += size
+        self._outlook._call("Attachments.Add", path)
+        attachment = FakeAttachment(self._outlook, path)
+        self.items.append(attachment)
+        return attachment
+
+
+class FakeAttachment:
+    def __init__(self, outlook: FakeOutlook, path: str):
+        self.FileName = os.path.basename(path)
+        self.PropertyAccessor = FakePropertyAccessor(outlook)
+
+
+class FakePropertyAccessor:
+    def __init__(self, outlook: FakeOutlook):
+        self._outlook = outlook
+        self.properties = {}
+
+    def SetProperty(self, name, value):
+        self._outlook._call("SetProperty", (name, value))
+        self.properties[name] = value
+
+
+def fake_outlook_transport(latency=None):
+    # Module-level so a functools.partial of it pickles into spawned shard processes.
+    from transports import OutlookTransport
+    return OutlookTransport(application=FakeOutlook(latency), com_error=FakeComError)
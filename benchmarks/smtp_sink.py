@@ -0,0 +1,123 @@
+import socketserver
+import threading
+import time
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        sink = self.server.sink
+        self._reply("220 mailops-sink ESMTP ready")
+        recipients = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line[:4].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-mailops-sink\r\n250-PIPELINING\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif verb == "HELO":
+                self._reply("250 mailops-sink")
+            elif verb == "AUTH":
+                if line.upper().startswith("AUTH LOGIN"):
+                    self._reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 2.1.0 OK")
+            elif verb == "RCPT":
+                recipient = line[8:].strip()
+                refusal = sink.refuse.get(recipient.strip("<>").casefold())
+                if refusal:
+                    self._reply(refusal)
+                    continue
+                recipients.append(recipient)
+                self._reply("250 2.1.5 OK")
+            elif verb == "DATA":
+                if not recipients:
+                    self._reply("554 5.5.1 No valid recipients")
+                    continue
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    size += len(chunk)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.record(len(recipients), size)
+                self._reply("250 2.0.0 Queued")
+            elif verb == "RSET":
+                recipients = []
+                self._reply("250 2.0.0 OK")
+            elif verb == "NOOP":
+                self._reply("250 2.0.0 OK")
+            elif verb == "QUIT":
+                self._reply("221 2.0.0 Bye")
+                return
+            else:
+                self._reply("502 5.5.2 Command not recognized")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SmtpSink:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, refuse: dict = None):
+        self.latency = latency
+        # address -> reply line for RCPT TO, e.g. {"gone@example.com": "550 5.1.1 No such user"}
+        self.refuse = {address.casefold(): reply for address, reply in (refuse or {}).items()}
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _SinkHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+
+    def record(self, recipients: int, size: int):
+        with self._lock:
+            self.messages += 1
+            self.recipients += recipients
+            self.bytes += size
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local SMTP sink that accepts and discards every message.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before acknowledging each message.")
+    args = parser.parse_args()
+    sink = SmtpSink(args.host, args.port, args.latency)
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,175 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import html
+import logging
+import multiprocessing
+import os
+import sys
+from datetime import datetime
+
+from batch import BatchError, BatchJob, BatchRunner
+from journal import journal_path_for
+from logpipeline import LogPipeline
+from metrics import BatchMetrics
+from signature import PreparedSignature, SignatureCache, latest_signature_file, outlook_signature_dir, signature_files_dir
+from transports import SmtpSettings, TransportSpec
+
+APP_NAME = "MailOps"
+PASSWORD_ENV = "MAILOPS_SMTP_PASSWORD"
+
+EXIT_OK, EXIT_FAILURES, EXIT_ERROR = 0, 1, 2
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description=f"{APP_NAME} headless batch sender. Sends one email per row of the recipient list.",
+    )
+    parser.add_argument("recipients", help="recipient list (.xlsx, .xls or .csv) with an Email column")
+    parser.add_argument("-s", "--subject", required=True, help="base subject line")
+    parser.add_argument("-b", "--body", required=True, metavar="FILE",
+                        help="email body; .htm/.html files are used as-is, anything else is sent as plain text")
+    parser.add_argument("--cc", default="", help="CC address(es) added to every email, separated by ';'")
+    parser.add_argument("--transport", choices=("outlook", "smtp"), default="outlook")
+    parser.add_argument("--signature", metavar="FILE",
+                        help="signature .htm file (default: the newest Outlook signature)")
+    parser.add_argument("--no-signature", action="store_true", help="send without a signature")
+    parser.add_argument("--rate-limit", type=float, default=0, metavar="PER_MIN",
+                        help="maximum emails per minute (default: unlimited, slows down when throttled)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="send again to recipients already recorded as sent in the journal")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="split the list across N delivery sessions, each in its own process (default: 1)")
+    parser.add_argument("--log-dir", default="", help="directory for the log file, rejected-rows report and send journal (created if missing)")
+    parser.add_argument("--report", metavar="FILE",
+                        help="write the JSON timing report here (default: next to the log file)")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="also write the timing report in Prometheus text format, e.g. for a textfile collector")
+    smtp = parser.add_argument_group("SMTP options")
+    smtp.add_argument("--smtp-host", default="localhost", metavar="HOST[:PORT]")
+    smtp.add_argument("--smtp-user", default="")
+    smtp.add_argument("--smtp-password-env", default=PASSWORD_ENV, metavar="VAR",
+                      help=f"environment variable holding the SMTP password (default: {PASSWORD_ENV})")
+    smtp.add_argument("--smtp-from", default="", help="From address (default: the SMTP user)")
+    smtp.add_argument("--smtp-pool", type=int, default=4, help="number of SMTP connections")
+    smtp.add_argument("--no-starttls", action="store_true", help="do not upgrade the connection with STARTTLS")
+    smtp.add_argument("--ssl", action="store_true", help="connect with implicit TLS (usually port 465)")
+    return parser
+
+
+def read_body(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in (".htm", ".html"):
+        return text
+    return "<p>" + html.escape(text).replace("\n", "<br>") + "</p>"
+
+
+def load_signature(args):
+    if args.no_signature:
+        return PreparedSignature()
+    sig_path = args.signature
+    if not sig_path:
+        sig_dir = outlook_signature_dir()
+        if not os.path.isdir(sig_dir):
+            logging.warning(f"Signature directory not found: {sig_dir}. Sending without a signature.")
+            return PreparedSignature()
+        sig_path = latest_signature_file(sig_dir)
+        if not sig_path:
+            logging.warning("No .htm signature files found in directory. Sending without a signature.")
+            return PreparedSignature()
+    logging.info(f"Using signature file: {sig_path}")
+    return SignatureCache().get(sig_path, signature_files_dir(sig_path))
+
+
+def create_transport_spec(args):
+    if args.transport == "outlook":
+        return TransportSpec("outlook")
+    host, _, port = args.smtp_host.partition(':')
+    starttls = not args.no_starttls and not args.ssl
+    settings = SmtpSettings(
+        host=host or "localhost",
+        port=int(port) if port.isdigit() else (465 if args.ssl else 587 if starttls else 25),
+        username=args.smtp_user,
+        password=os.environ.get(args.smtp_password_env, ""),
+        sender=args.smtp_from or args.smtp_user,
+        starttls=starttls,
+        use_ssl=args.ssl,
+        pool_size=args.smtp_pool,
+    )
+    return TransportSpec("smtp", smtp=settings)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.log_dir:
+        try:
+            os.makedirs(args.log_dir, exist_ok=True)
+        except OSError as e:
+            parser.error(f"cannot use --log-dir {args.log_dir}: {e.strerror or e}")
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_file_path = os.path.join(args.log_dir, f"mailops_log_{timestamp}.log")
+    pipeline = LogPipeline(log_file_path, ui_capacity=0).start()
+    try:
+        logging.info(f"{APP_NAME} headless run starting.")
+        from preflight import invalid_addresses, normalize_addresses
+        cc = args.cc.strip()
+        bad_cc = invalid_addresses(normalize_addresses(cc))
+        if bad_cc:
+            logging.error(f"These CC addresses are not valid: {', '.join(bad_cc)}")
+            return EXIT_ERROR
+        metrics = BatchMetrics()
+        try:
+            body_html = read_body(args.body)
+            with metrics.stage("signature"):
+                signature = load_signature(args)
+        except OSError as e:
+            logging.error(f"Could not read {e.filename}: {e.strerror}")
+            return EXIT_ERROR
+        job = BatchJob(
+            excel_path=args.recipients,
+            subject=args.subject.strip(),
+            body_html=body_html,
+            cc=cc,
+            signature=signature,
+            rejected_report_path=f"{os.path.splitext(log_file_path)[0]}_rejected.csv",
+            report_path=args.report or f"{os.path.splitext(log_file_path)[0]}_report.json",
+            prometheus_path=args.prometheus or "",
+            journal_path=journal_path_for(args.recipients, args.log_dir),
+            resume=not args.no_resume,
+            rate_limit=args.rate_limit / 60.0,
+        )
+        logging.info(f"Ready to send after {(time.perf_counter() - _STARTED) * 1000:.0f} ms of start-up.")
+        spec = create_transport_spec(args)
+        if args.workers > 1:
+            from shards import ShardedBatchRunner
+            runner = ShardedBatchRunner(job, spec, args.workers, metrics=metrics)
+        else:
+            runner = BatchRunner(job, spec.create(), metrics=metrics)
+        try:
+            summary = runner.run()
+        except BatchError as e:
+            logging.error(f"{e.title}: {e}")
+            return EXIT_ERROR
+        except KeyboardInterrupt:
+            logging.warning("Interrupted; rows sent so far are recorded in the send journal.")
+            return EXIT_ERROR
+        logging.info(f"Sent {summary.sent} · Skipped {summary.skipped} · Failed {summary.failed} "
+                     f"({summary.already_sent} already sent, {summary.rejected} rejected in pre-flight).")
+        if summary.rejected_report:
+            logging.info(f"Rejected rows: {summary.rejected_report}")
+        if summary.report:
+            logging.info(f"Timing report: {summary.report}")
+        logging.info(f"A detailed log file has been saved to: {os.path.abspath(log_file_path)}")
+        return EXIT_FAILURES if summary.failed else EXIT_OK
+    finally:
+        pipeline.stop()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from transports import split_addresses
+
+JOURNAL_SUFFIX = ".mailops-journal.sqlite"
+COMPLETED_STATUSES = ("sent",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sends (
+    key TEXT PRIMARY KEY,
+    row_number INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    detail TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def campaign_key(body_html: str, signature_html: str = "") -> str:
+    # Identifies the message content, so a new body sent to the same list is not mistaken for a resume.
+    material = "\x1f".join((body_html, signature_html or ""))
+    return hashlib.sha1(material.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def row_key(to: str, subject: str, attachment: str = "", campaign: str = "") -> str:
+    # Keyed on the bare addresses, so adding or editing a display name does not look like a new recipient.
+    material = "\x1f".join(("; ".join(split_addresses(to)).casefold(), subject, attachment or "", campaign))
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def journal_path_for(recipients_path: str, directory: str = "") -> str:
+    source = os.path.abspath(recipients_path)
+    digest = hashlib.sha1(source.casefold().encode("utf-8")).hexdigest()[:12]
+    name = f"{os.path.splitext(os.path.basename(source))[0]}-{digest}{JOURNAL_SUFFIX}"
+    return os.path.join(directory, name) if directory else name
+
+
+class SendJournal:
+    def __init__(self, path: str, flush_every: int = 100, flush_interval: float = 0.5, busy_timeout: float = 30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._conn = None
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def open(self):
+        # Sharded batches share one journal across processes, so writers may briefly wait on each other.
+        self._conn = sqlite3.connect(self.path, isolation_level=None, timeout=self.busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        # The batch can block for a long time on a slow send or a retry delay; rows recorded before that
+        # must not sit in the buffer until the next record() call.
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="journal-flush", daemon=True)
+        self._flusher.start()
+        return self
+
+    def close(self):
+        if self._conn is None:
+            return
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def completed_keys(self) -> set:
+        placeholders = ",".join("?" * len(COMPLETED_STATUSES))
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT key FROM sends WHERE status IN ({placeholders})", COMPLETED_STATUSES)
+            return {key for (key,) in cursor}
+
+    def record(self, key: str, row_number: int, email: str, status: str, detail: str = ""):
+        with self._lock:
+            self._buffer.append((key, row_number, email, status, detail, time.time()))
+            if len(self._buffer) >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer or self._conn is None:
+                return
+            rows, self._buffer = self._buffer, []
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO sends (key, row_number, email, status, detail, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET row_number = excluded.row_number, email = excluded.email, "
+                    "status = CASE WHEN sends.status = 'sent' THEN sends.status ELSE excluded.status END, "
+                    "detail = excluded.detail, updated_at = excluded.updated_at",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM sends GROUP BY status").fetchall())
@@ -0,0 +1,108 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import deque
+
+FILE_FORMAT = '%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(lineno)d - %(message)s'
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+UI_FORMAT = '%(asctime)s - %(message)s'
+UI_TIME_FORMAT = '%H:%M:%S'
+
+
+def default_log(message, level=logging.INFO):
+    # The log callable used by the Qt-free modules when the caller does not supply one.
+    logging.log(level, message)
+
+
+class LogRingBuffer:
+    def __init__(self, capacity: int = 5000):
+        self._lines = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def append(self, line: str):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+
+    def drain(self):
+        with self._lock:
+            if not self._lines and not self._dropped:
+                return [], 0
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self._dropped = self._dropped, 0
+        return lines, dropped
+
+
+class RingBufferHandler(logging.Handler):
+    def __init__(self, buffer: LogRingBuffer, level=logging.INFO):
+        super().__init__(level)
+        self.buffer = buffer
+        self.setFormatter(logging.Formatter(UI_FORMAT, UI_TIME_FORMAT))
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Records never leave the process, so formatting can wait for the listener thread.
+        return record
+
+
+class LogPipeline:
+    def __init__(self, log_file_path: str = "", file_level=logging.DEBUG, console_level=logging.INFO,
+                 ui_capacity: int = 5000):
+        self.log_file_path = log_file_path
+        self.queue = queue.SimpleQueue()
+        self.ui_buffer = LogRingBuffer(ui_capacity) if ui_capacity else None
+        self.handlers = []
+        if log_file_path:
+            file_handler = logging.FileHandler(log_file_path, mode='w', encoding='utf-8')
+            file_handler.setLevel(file_level)
+            file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            self.handlers.append(file_handler)
+        if console_level is not None:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(console_level)
+            console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            self.handlers.append(console_handler)
+        if self.ui_buffer is not None:
+            self.handlers.append(RingBufferHandler(self.ui_buffer))
+        self.level = min((handler.level for handler in self.handlers), default=logging.WARNING)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self._previous = None
+
+    def start(self):
+        root = logging.getLogger()
+        self._previous = (root.level, root.handlers[:])
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_InProcessQueueHandler(self.queue))
+        root.setLevel(self.level)
+        self.listener.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        if self._previous is None:
+            return
+        root = logging.getLogger()
+        level, handlers = self._previous
+        self._previous = None
+        self.listener.stop()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+        for handler in self.handlers:
+            handler.close()
+        atexit.unregister(self.stop)
@@ -1,29 +1,51 @@
 import sys
 import os
-import re
-import random
+import threading
+import multiprocessing
 import numpy as np
-import pandas as pd
-import win32com.client
-import pythoncom
 import logging
-import urllib.parse
 from datetime import datetime
-from PyQt6.QtCore import Qt, QTimer, QRectF, QPointF
-from PyQt6.QtGui import QPainter, QPainterPath, QLinearGradient, QColor, QPen, QFont, QBrush, QRadialGradient
+from PyQt6.QtCore import Qt, QTimer, QRectF, QPointF, QObject, QThread, pyqtSignal
+from PyQt6 import sip
+from PyQt6.QtGui import QPainter, QPolygonF, QLinearGradient, QColor, QPen, QFont, QBrush, QRadialGradient, QPixmap
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QLabel,
-    QLineEdit, QTextEdit, QFileDialog, QMessageBox, QCheckBox, QDialog
+    QLineEdit, QTextEdit, QFileDialog, QMessageBox, QCheckBox, QDialog,
+    QComboBox, QSpinBox, QFormLayout, QHBoxLayout, QProgressBar
 )
+from batch import BatchError, BatchJob, BatchRunner, SENT, SKIPPED, FAILED
+from journal import journal_path_for
+from logpipeline import LogPipeline
+from metrics import BatchMetrics
+from signature import PreparedSignature, SignatureCache, latest_signature_file, outlook_signature_dir, signature_files_dir
+from transports import SmtpSettings, TransportSpec
 
 APP_NAME = "MailOps"
 APP_TAGLINE = "Precision bulk email. Zero surprises."
 
 class WaveSplashScreen(QWidget):
+    MAX_PARTICLES = 300
+    SPAWN_PER_FRAME = 5
+    LIFE_STEP = 0.005
+    SPRITE_RADIUS = 16
+    WAVE_STEP = 10
+
     def __init__(self, width: int = 854, height: int = 480):
         super().__init__()
         self.width, self.height = width, height
-        self.t, self.particles = 0.0, []
+        self.t = 0.0
+        self.rng = np.random.default_rng()
+        # One row per particle attribute; a slot whose life has run out is free for the next spawn.
+        self.particles = np.zeros((8, self.MAX_PARTICLES))
+        self.px, self.py, self.vx, self.vy, self.max_alpha, self.size, self.life, self.alpha = self.particles
+        self.wave_x = np.concatenate(([-10.0], np.arange(0, self.width + 11, self.WAVE_STEP, dtype=float)))
+        self.wave_y = self._wave(self.wave_x, self.t)
+        self.background = self._render_background()
+        self.sprite = self._render_sprite()
+        self.fragments = sip.array(QPainter.PixmapFragment, self.MAX_PARTICLES)
+        for fragment in self.fragments:
+            fragment.width = fragment.height = 2 * self.SPRITE_RADIUS
+            fragment.sourceLeft = fragment.sourceTop = fragment.rotation = 0
         self.setFixedSize(self.width, self.height)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
         self.title_font = QFont("sans-serif", 52, QFont.Weight.Bold)
@@ -33,6 +55,31 @@ class WaveSplashScreen(QWidget):
         self.timer.setInterval(16)
         self.timer.timeout.connect(self._update_animation)
 
+    def _render_background(self) -> QPixmap:
+        background = QPixmap(self.width, self.height)
+        gradient = QLinearGradient(0, 0, 0, self.height)
+        gradient.setColorAt(0, QColor(60, 80, 120))
+        gradient.setColorAt(1, QColor(35, 45, 80))
+        painter = QPainter(background)
+        painter.fillRect(background.rect(), gradient)
+        painter.end()
+        return background
+
+    def _render_sprite(self) -> QPixmap:
+        radius = self.SPRITE_RADIUS
+        sprite = QPixmap(2 * radius, 2 * radius)
+        sprite.fill(Qt.GlobalColor.transparent)
+        gradient = QRadialGradient(QPointF(radius, radius), radius)
+        gradient.setColorAt(0, QColor(255, 255, 255, 255))
+        gradient.setColorAt(1, QColor(255, 255, 255, 0))
+        painter = QPainter(sprite)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QBrush(gradient))
+        painter.drawEllipse(QPointF(radius, radius), radius, radius)
+        painter.end()
+        return sprite
+
     def showEvent(self, event):
         if self.screen():
             screen_geometry = self.screen().geometry()
@@ -44,59 +91,59 @@ class WaveSplashScreen(QWidget):
         self.timer.stop()
         super().hideEvent(event)
 
-    def _wave(self, x: float, t: float) -> float:
+    def _wave(self, x, t: float):
         y = np.sin((x * 0.005) + t * 1.0) * 30
         y += np.sin((x * 0.01) + t * 2.5) * 40
         y += np.sin((x * 0.02) + t * 0.5) * 20
         return y + self.height * 0.45
 
+    def _spawn(self, slots):
+        count, rng = len(slots), self.rng
+        x_pos = rng.uniform(0, self.width, count)
+        self.px[slots] = x_pos
+        self.py[slots] = self._wave(x_pos, self.t) + rng.uniform(-20, 20, count)
+        self.vx[slots] = rng.uniform(-0.5, 0.5, count)
+        self.vy[slots] = rng.uniform(-0.2, 0.2, count)
+        self.max_alpha[slots] = rng.uniform(100, 200, count)
+        self.size[slots] = rng.uniform(1.5, 4.5, count)
+        self.life[slots] = 1.0
+
     def _update_animation(self):
         self.t += 0.01
-        if len(self.particles) < 300:
-            for _ in range(5):
-                x_pos = random.uniform(0, self.width)
-                self.particles.append(
-                    {
-                        'x': x_pos,
-                        'y': self._wave(x_pos, self.t) + random.uniform(-20, 20),
-                        'vx': random.uniform(-0.5, 0.5),
-                        'vy': random.uniform(-0.2, 0.2),
-                        'alpha': random.uniform(50, 150),
-                        'max_alpha': random.uniform(100, 200),
-                        'size': random.uniform(1.5, 4.5),
-                        'life': 1.0,
-                    }
-                )
-        self.particles = [p for p in self.particles if p['life'] > 0]
-        for p in self.particles:
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            p['life'] -= 0.005
-            p['alpha'] = p['max_alpha'] * np.sin(p['life'] * np.pi)
+        free = np.flatnonzero(self.life <= 0)
+        if len(free):
+            self._spawn(free[:self.SPAWN_PER_FRAME])
+        self.px += self.vx
+        self.py += self.vy
+        self.life -= self.LIFE_STEP
+        np.multiply(self.life, np.pi, out=self.alpha)
+        np.sin(self.alpha, out=self.alpha)
+        self.alpha *= self.max_alpha
+        self.wave_y = self._wave(self.wave_x, self.t)
         self.update()
 
+    def _draw_particles(self, painter):
+        live = np.flatnonzero(self.life > 0)
+        if not len(live):
+            return
+        fragments = self.fragments
+        scale = self.size[live] / self.SPRITE_RADIUS
+        opacity = self.alpha[live] / 255
+        for fragment, x, y, s, o in zip(fragments, self.px[live].tolist(), self.py[live].tolist(), scale.tolist(),
+                                        opacity.tolist()):
+            fragment.x, fragment.y, fragment.scaleX, fragment.scaleY, fragment.opacity = x, y, s, s, o
+        painter.drawPixmapFragments(fragments[:len(live)], self.sprite)
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        gradient = QLinearGradient(0, 0, 0, self.height)
-        gradient.setColorAt(0, QColor(60, 80, 120))
-        gradient.setColorAt(1, QColor(35, 45, 80))
-        painter.fillRect(self.rect(), gradient)
-        path = QPainterPath()
-        path.moveTo(-10, self._wave(-10, self.t))
-        for x in range(0, self.width + 11, 10):
-            path.lineTo(x, self._wave(x, self.t))
+        painter.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawPixmap(0, 0, self.background)
+        wave = QPolygonF(list(map(QPointF, self.wave_x.tolist(), self.wave_y.tolist())))
         for width, color in [(25, QColor(0, 255, 255, 6)), (15, QColor(100, 255, 255, 12)), (5, QColor(200, 255, 255, 25))]:
             pen = QPen(color, width, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap)
             painter.setPen(pen)
-            painter.drawPath(path)
-        painter.setPen(Qt.PenStyle.NoPen)
-        for p in self.particles:
-            grad = QRadialGradient(QPointF(p['x'], p['y']), p['size'])
-            grad.setColorAt(0, QColor(255, 255, 255, int(p['alpha'])))
-            grad.setColorAt(1, QColor(255, 255, 255, 0))
-            painter.setBrush(QBrush(grad))
-            painter.drawEllipse(QPointF(p['x'], p['y']), p['size'], p['size'])
+            painter.drawPolyline(wave)
+        self._draw_particles(painter)
         text_opacity = max(0.0, min(1.0, (self.t - 0.5) / 1.5))
         if text_opacity > 0:
             painter.setPen(QColor(255, 255, 255, int(255 * text_opacity)))
@@ -107,14 +154,67 @@ class WaveSplashScreen(QWidget):
             painter.setFont(self.credit_font)
             painter.drawText(QRectF(0, self.height - 30, self.width, 20), Qt.AlignmentFlag.AlignCenter, "Built by Joshua Taitt – Neta Scientific")
 
+class BatchWorker(QObject):
+    progress = pyqtSignal(int, int)
+    row_result = pyqtSignal(object)
+    preview_requested = pyqtSignal(str, str)
+    failed = pyqtSignal(str, str)
+    finished = pyqtSignal(object)
+
+    def __init__(self, job: BatchJob, transport, metrics=None, spec=None, sessions=1):
+        super().__init__()
+        if sessions > 1:
+            from shards import ShardedBatchRunner
+            self.runner = ShardedBatchRunner(job, spec, sessions, on_progress=self.progress.emit,
+                                             on_result=self.row_result.emit, metrics=metrics)
+        else:
+            self.runner = BatchRunner(job, transport, on_progress=self.progress.emit,
+                                      on_result=self.row_result.emit, confirm=self._confirm, metrics=metrics)
+        self._preview_event = threading.Event()
+        self._preview_answer = False
+
+    def _confirm(self, email_address, attachment_note):
+        self._preview_event.clear()
+        # cancel() may have set the event just before the clear above; it would never be set again.
+        if self.runner.cancelled:
+            return False
+        self.preview_requested.emit(email_address, attachment_note)
+        self._preview_event.wait()
+        return self._preview_answer and not self.runner.cancelled
+
+    def answer_preview(self, accepted: bool):
+        self._preview_answer = accepted
+        self._preview_event.set()
+
+    def cancel(self):
+        self.runner.cancel()
+        self._preview_event.set()
+
+    def run(self):
+        try:
+            summary = self.runner.run()
+        except BatchError as e:
+            self.failed.emit(e.title, str(e))
+            summary = None
+        except Exception as e:
+            logging.error(f"CRITICAL: Batch stopped unexpectedly. Error: {e}")
+            self.failed.emit("Error", f"The batch stopped unexpectedly.\nError: {e}")
+            summary = None
+        self.finished.emit(summary)
+
 class EmailSender(QWidget):
+    LOG_FLUSH_INTERVAL_MS = 100
+    LOG_VIEW_MAX_LINES = 5000
+
     def __init__(self):
         super().__init__()
-        self.outlook_app = None
+        self.batch_thread = None
+        self.batch_worker = None
+        self._row_counts = {}
+        self.signature_cache = SignatureCache()
         self.log_file_path = ""
+        self.log_pipeline = None
         self.excel_path = None
-        self._ui_ready = False
-        self._log_buffer = []
         self.setup_logging()
         self.init_ui()
 
@@ -128,10 +228,59 @@ class EmailSender(QWidget):
         self.body_input = QTextEdit()
         self.file_btn = QPushButton("Select Excel File")
         self.file_label = QLabel("No Excel file selected.")
+        self.transport_combo = QComboBox()
+        self.transport_combo.addItems(["Outlook (classic)", "SMTP server"])
+        self.smtp_settings_box = QWidget()
+        smtp_form = QFormLayout(self.smtp_settings_box)
+        smtp_form.setContentsMargins(0, 0, 0, 0)
+        self.smtp_host_input = QLineEdit()
+        self.smtp_host_input.setPlaceholderText("smtp.example.com:587")
+        self.smtp_user_input = QLineEdit()
+        self.smtp_password_input = QLineEdit()
+        self.smtp_password_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.smtp_sender_input = QLineEdit()
+        self.smtp_starttls_checkbox = QCheckBox("Use STARTTLS")
+        self.smtp_starttls_checkbox.setChecked(True)
+        self.smtp_pool_input = QSpinBox()
+        self.smtp_pool_input.setRange(1, 32)
+        self.smtp_pool_input.setValue(4)
+        smtp_form.addRow("Server (host:port):", self.smtp_host_input)
+        smtp_form.addRow("Username:", self.smtp_user_input)
+        smtp_form.addRow("Password:", self.smtp_password_input)
+        smtp_form.addRow("From address:", self.smtp_sender_input)
+        smtp_form.addRow("Connections:", self.smtp_pool_input)
+        smtp_form.addRow("", self.smtp_starttls_checkbox)
+        self.smtp_settings_box.setVisible(False)
+        self.rate_limit_input = QSpinBox()
+        self.rate_limit_input.setRange(0, 100000)
+        self.rate_limit_input.setSuffix(" emails/min")
+        self.rate_limit_input.setSpecialValueText("Unlimited (slows down automatically when throttled)")
+        self.sessions_input = QSpinBox()
+        self.sessions_input.setRange(1, 16)
+        self.sessions_input.setValue(1)
+        self.sessions_input.setSuffix(" session(s)")
+        self.sessions_input.setToolTip("Split the list across this many independent delivery sessions, each in its own process.")
         self.preview_checkbox = QCheckBox("Preview each email before sending (Recommended for testing)")
+        self.resume_checkbox = QCheckBox("Skip recipients already sent from this list in a previous run (resume)")
+        self.resume_checkbox.setChecked(True)
         self.send_btn = QPushButton("Start Sending Emails")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat("%v / %m")
+        self.status_label = QLabel("")
+        self.pause_btn = QPushButton("Pause")
+        self.cancel_btn = QPushButton("Cancel")
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        batch_controls = QHBoxLayout()
+        batch_controls.addWidget(self.progress_bar, 1)
+        batch_controls.addWidget(self.pause_btn)
+        batch_controls.addWidget(self.cancel_btn)
         self.log_output = QTextEdit()
         self.log_output.setReadOnly(True)
+        self.log_output.document().setMaximumBlockCount(self.LOG_VIEW_MAX_LINES)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.setInterval(self.LOG_FLUSH_INTERVAL_MS)
+        self.log_flush_timer.timeout.connect(self.flush_log_view)
         layout.addWidget(self.help_btn)
         layout.addWidget(QLabel("Subject:"))
         layout.addWidget(self.subject_input)
@@ -139,34 +288,36 @@ class EmailSender(QWidget):
         layout.addWidget(self.cc_input)
         layout.addWidget(QLabel("Email Body (Copy from Word and Paste Here):"))
         layout.addWidget(self.body_input)
+        layout.addWidget(QLabel("Delivery method:"))
+        layout.addWidget(self.transport_combo)
+        layout.addWidget(self.smtp_settings_box)
+        layout.addWidget(QLabel("Maximum send rate:"))
+        layout.addWidget(self.rate_limit_input)
+        layout.addWidget(QLabel("Parallel sessions:"))
+        layout.addWidget(self.sessions_input)
         layout.addWidget(self.file_btn)
         layout.addWidget(self.file_label)
         layout.addWidget(self.preview_checkbox)
+        layout.addWidget(self.resume_checkbox)
         layout.addWidget(self.send_btn)
+        layout.addLayout(batch_controls)
+        layout.addWidget(self.status_label)
         layout.addWidget(QLabel("Log Output:"))
         layout.addWidget(self.log_output)
         self.setLayout(layout)
         self.file_btn.clicked.connect(self.select_excel_file)
         self.send_btn.clicked.connect(self.send_emails)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn.clicked.connect(self.cancel_batch)
         self.help_btn.clicked.connect(self.show_help_dialog)
-        self._ui_ready = True
-        if self._log_buffer:
-            for ts, msg in self._log_buffer:
-                self.log_output.append(f"{ts} - {msg}")
-            self._log_buffer.clear()
-        QApplication.processEvents()
+        self.transport_combo.currentIndexChanged.connect(lambda index: self.smtp_settings_box.setVisible(index == 1))
+        self.flush_log_view()
+        self.log_flush_timer.start()
 
     def setup_logging(self):
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.log_file_path = f"mailops_log_{timestamp}.log"
-        logging.basicConfig(level=logging.DEBUG,
-                            format='%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(lineno)d - %(message)s',
-                            filename=self.log_file_path, filemode='w')
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(formatter)
-        logging.getLogger().addHandler(console_handler)
+        self.log_pipeline = LogPipeline(self.log_file_path, ui_capacity=self.LOG_VIEW_MAX_LINES).start()
         self.log_message("Logging initialized.", logging.DEBUG)
         self.log_message(f"{APP_NAME} starting.", logging.INFO)
 
@@ -174,98 +325,54 @@ class EmailSender(QWidget):
         log_levels = {logging.DEBUG: logging.debug, logging.INFO: logging.info, logging.WARNING: logging.warning, logging.ERROR: logging.error}
         log_function = log_levels.get(level, logging.info)
         log_function(message)
-        ts = datetime.now().strftime('%H:%M:%S')
-        if level >= logging.INFO:
-            if self._ui_ready:
-                self.log_output.append(f"{ts} - {message}")
-            else:
-                self._log_buffer.append((ts, message))
-        QApplication.processEvents()
+
+    def flush_log_view(self):
+        lines, dropped = self.log_pipeline.ui_buffer.drain()
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"... {dropped} earlier line(s) not shown here; see {self.log_file_path}")
+        text = "\n".join(lines)
+        cursor = self.log_output.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text if self.log_output.document().isEmpty() else "\n" + text)
+        scrollbar = self.log_output.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
 
     def get_signature_from_file(self):
         self.log_message("Reading Outlook signature.", logging.DEBUG)
-        sig_dir = os.path.join(os.getenv("APPDATA"), "Microsoft", "Signatures")
+        sig_dir = outlook_signature_dir()
         if not os.path.isdir(sig_dir):
             self.log_message(f"Signature directory not found: {sig_dir}", logging.ERROR)
             QMessageBox.critical(self, "Signature Error", f"Signature directory not found:\n{sig_dir}")
-            return None, None
-        htm_files = [f for f in os.listdir(sig_dir) if f.endswith(".htm")]
-        if not htm_files:
+            return None
+        sig_path = latest_signature_file(sig_dir)
+        if not sig_path:
             self.log_message("No .htm signature files found in directory.", logging.WARNING)
             QMessageBox.warning(self, "Signature Error", "No HTML signature files found.")
-            return "", ""
-        latest_file = max(htm_files, key=lambda f: os.path.getmtime(os.path.join(sig_dir, f)))
-        sig_path = os.path.join(sig_dir, latest_file)
+            return PreparedSignature()
         self.log_message(f"Using signature file: {sig_path}", logging.INFO)
-        sig_base_name = os.path.splitext(latest_file)[0]
-        sig_files_dirname = f"{sig_base_name}_files"
-        sig_files_dirpath = os.path.join(sig_dir, sig_files_dirname)
-        html_content = ""
-        try:
-            with open(sig_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-        except Exception:
-            self.log_message(f"Signature file {sig_path} not UTF-8, trying cp1252.", logging.DEBUG)
-            with open(sig_path, "r", encoding="cp1252") as f:
-                html_content = f.read()
-        return html_content, sig_files_dirpath
-
-    def embed_images_and_update_html(self, mail_item, signature_html, sig_files_dirpath):
-        self.log_message("Embedding signature images.", logging.DEBUG)
-        if not signature_html or not sig_files_dirpath or not os.path.isdir(sig_files_dirpath):
-            self.log_message("Signature HTML empty or assets missing, using original HTML.", logging.WARNING)
-            return signature_html
-        updated_html = signature_html
-        html_relative_folder_name = os.path.basename(sig_files_dirpath)
-        referenced_files = {f.lower() for f in re.findall(r'src=["\'](?:[^"\']*/)?([^"\']+)["\']', signature_html, re.IGNORECASE)}
-        for image_filename in os.listdir(sig_files_dirpath):
-            try:
-                if image_filename.lower() not in referenced_files:
-                    continue
-                image_path = os.path.join(sig_files_dirpath, image_filename)
-                cid = image_filename
-                attachment = mail_item.Attachments.Add(image_path)
-                attachment.PropertyAccessor.SetProperty("http://schemas.microsoft.com/mapi/proptag/0x3712001F", cid)
-                path_raw = f"{html_relative_folder_name}/{image_filename}"
-                path_encoded = f"{html_relative_folder_name}/{urllib.parse.quote(image_filename)}"
-                cid_link = f"cid:{cid}"
-                updated_html = (
-                    updated_html
-                    .replace(f'src="{path_raw}"', f'src="{cid_link}"')
-                    .replace(f"src='{path_raw}'", f"src='{cid_link}'")
-                    .replace(f'src="{path_encoded}"', f'src="{cid_link}"')
-                    .replace(f"src='{path_encoded}'", f"src='{cid_link}'")
-                )
-            except Exception as e:
-                self.log_message(f"Failed to embed image '{image_filename}': {e}", logging.ERROR)
-        return updated_html
-
-    def try_attach_file(self, mail_item, attachment_path, email_address):
-        if pd.isna(attachment_path) or not isinstance(attachment_path, str):
-            return "No attachment specified."
-        path_list = attachment_path.split(';')
-        attachment_notes = []
-        for path in path_list:
-            clean_path = path.strip().strip('"').strip("'")
-            if not clean_path:
-                continue
-            if not os.path.isfile(clean_path):
-                self.log_message(f"Attachment file not found: {clean_path}", logging.WARNING)
-                attachment_notes.append(f"NOT FOUND: {os.path.basename(clean_path)}")
-            else:
-                try:
-                    mail_item.Attachments.Add(clean_path)
-                    self.log_message(f"Attached: {clean_path}", logging.INFO)
-                    attachment_notes.append(f"Attached: {os.path.basename(clean_path)}")
-                except Exception as e:
-                    self.log_message(f"Error attaching '{clean_path}' for '{email_address}': {e}", logging.ERROR)
-                    attachment_notes.append(f"ERROR attaching: {os.path.basename(clean_path)}")
-        if not attachment_notes:
-            return "No valid attachments specified."
-        return "\n".join(attachment_notes)
+        return self.signature_cache.get(sig_path, signature_files_dir(sig_path), self.log_message)
+
+    def create_transport_spec(self):
+        if self.transport_combo.currentIndex() == 0:
+            return TransportSpec("outlook")
+        host, _, port = self.smtp_host_input.text().strip().partition(':')
+        starttls = self.smtp_starttls_checkbox.isChecked()
+        username = self.smtp_user_input.text().strip()
+        settings = SmtpSettings(
+            host=host or "localhost",
+            port=int(port) if port.isdigit() else (587 if starttls else 25),
+            username=username,
+            password=self.smtp_password_input.text(),
+            sender=self.smtp_sender_input.text().strip() or username,
+            starttls=starttls,
+            pool_size=self.smtp_pool_input.value(),
+        )
+        return TransportSpec("smtp", smtp=settings)
 
     def select_excel_file(self):
-        file, _ = QFileDialog.getOpenFileName(self, "Select Excel File", "", "Excel Files (*.xlsx *.xls)")
+        file, _ = QFileDialog.getOpenFileName(self, "Select Excel File", "", "Recipient Lists (*.xlsx *.xls *.csv)")
         if file:
             self.excel_path = file
             self.file_label.setText(f"Selected: {os.path.basename(file)}")
@@ -273,6 +380,8 @@ class EmailSender(QWidget):
 
     def send_emails(self):
         self.log_message("Send_emails process started.", logging.INFO)
+        if self.batch_thread is not None:
+            return
         if not self.excel_path:
             QMessageBox.critical(self, "Error", "An Excel file has not been selected.")
             return
@@ -281,86 +390,145 @@ class EmailSender(QWidget):
         if not base_subject or not self.body_input.toPlainText().strip():
             QMessageBox.warning(self, "Missing Information", "The 'Subject' and 'Email Body' fields are required.")
             return
+        from preflight import invalid_addresses, normalize_addresses
+        cc = self.cc_input.text().strip()
+        bad_cc = invalid_addresses(normalize_addresses(cc))
+        if bad_cc:
+            QMessageBox.warning(self, "Invalid CC", f"These CC addresses are not valid:\n{', '.join(bad_cc)}")
+            return
+        preview_mode = self.preview_checkbox.isChecked()
+        sessions = self.sessions_input.value()
+        spec = self.create_transport_spec()
+        transport = spec.create()
+        if preview_mode and not transport.supports_preview:
+            QMessageBox.warning(self, "Preview Unavailable", f"Preview mode is not available with the {transport.name} delivery method.")
+            return
+        if preview_mode and sessions > 1:
+            QMessageBox.warning(self, "Preview Unavailable", "Preview mode needs a single session. Set 'Parallel sessions' to 1.")
+            return
+        metrics = BatchMetrics()
         try:
-            self.log_message("Initializing Outlook application.", logging.DEBUG)
-            self.outlook_app = win32com.client.Dispatch("Outlook.Application")
-            sig_html_original, sig_files_dirpath = self.get_signature_from_file()
-            if sig_html_original is None:
+            with metrics.stage("signature"):
+                signature = self.get_signature_from_file()
+            if signature is None:
                 return
         except Exception as e:
-            self.log_message(f"CRITICAL: Could not connect to Outlook or get signature. Error: {e}", logging.ERROR)
-            QMessageBox.critical(self, "Outlook Error", f"Could not connect to Outlook.\nError: {e}")
+            self.log_message(f"CRITICAL: Could not read signature. Error: {e}", logging.ERROR)
+            QMessageBox.critical(self, "Signature Error", f"Could not read the Outlook signature.\nError: {e}")
             return
-        try:
-            df = pd.read_excel(self.excel_path)
-            if 'Email' not in df.columns:
-                raise ValueError("Excel file must contain an 'Email' column.")
-            for col in ['Attachment', 'Greeting', 'Supplier Name']:
-                if col not in df.columns:
-                    df[col] = ''
-            df.fillna('', inplace=True)
-        except Exception as e:
-            self.log_message(f"ERROR reading Excel file: {e}", logging.ERROR)
-            QMessageBox.critical(self, "Excel Error", f"Failed to read the Excel file.\nError: {e}")
+        job = BatchJob(
+            excel_path=self.excel_path,
+            subject=base_subject,
+            body_html=body_html_from_ui,
+            cc=cc,
+            signature=signature,
+            preview=preview_mode,
+            rejected_report_path=f"{os.path.splitext(self.log_file_path)[0]}_rejected.csv",
+            report_path=f"{os.path.splitext(self.log_file_path)[0]}_report.json",
+            journal_path=journal_path_for(self.excel_path),
+            resume=self.resume_checkbox.isChecked(),
+            rate_limit=self.rate_limit_input.value() / 60.0,
+        )
+        self.start_batch(job, transport, metrics, spec, sessions)
+
+    def start_batch(self, job, transport, metrics=None, spec=None, sessions=1):
+        self.batch_thread = QThread(self)
+        self.batch_worker = BatchWorker(job, transport, metrics, spec, sessions)
+        self.batch_worker.moveToThread(self.batch_thread)
+        self.batch_thread.started.connect(self.batch_worker.run)
+        self.batch_worker.progress.connect(self.update_progress)
+        self.batch_worker.row_result.connect(self.record_row_result)
+        self.batch_worker.preview_requested.connect(self.confirm_preview)
+        self.batch_worker.failed.connect(self.on_batch_failed)
+        self.batch_worker.finished.connect(self.on_batch_finished)
+        self.batch_worker.finished.connect(self.batch_thread.quit)
+        self.batch_thread.finished.connect(self.batch_worker.deleteLater)
+        self.batch_thread.finished.connect(self.batch_thread.deleteLater)
+        self._row_counts = {SENT: 0, SKIPPED: 0, FAILED: 0}
+        self.progress_bar.setRange(0, 0)
+        self.status_label.setText("Starting…")
+        self._set_batch_running(True)
+        self.batch_thread.start()
+
+    def _set_batch_running(self, running: bool):
+        self.send_btn.setEnabled(not running)
+        self.file_btn.setEnabled(not running)
+        self.transport_combo.setEnabled(not running)
+        self.rate_limit_input.setEnabled(not running)
+        self.sessions_input.setEnabled(not running)
+        self.pause_btn.setEnabled(running)
+        self.cancel_btn.setEnabled(running)
+        self.pause_btn.setText("Pause")
+
+    def toggle_pause(self):
+        runner = self.batch_worker.runner
+        if runner.paused:
+            runner.resume()
+            self.pause_btn.setText("Pause")
+            self.log_message("Batch resumed.", logging.INFO)
+        else:
+            runner.pause()
+            self.pause_btn.setText("Resume")
+            self.log_message("Batch paused.", logging.INFO)
+
+    def cancel_batch(self):
+        if self.batch_worker is not None:
+            self.cancel_btn.setEnabled(False)
+            self.pause_btn.setEnabled(False)
+            self.log_message("Cancelling batch…", logging.WARNING)
+            self.batch_worker.cancel()
+
+    def update_progress(self, done, total):
+        if self.progress_bar.maximum() != total:
+            self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def record_row_result(self, result):
+        self._row_counts[result.status] += 1
+        self.status_label.setText(
+            f"Sent {self._row_counts[SENT]} · Skipped {self._row_counts[SKIPPED]} · Failed {self._row_counts[FAILED]}"
+        )
+
+    def confirm_preview(self, email_address, attachment_note):
+        reply = QMessageBox.question(
+            self,
+            "Confirm Send",
+            f"Review the email for {email_address}.\n\n{attachment_note}\n\nDo you want to send it?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        self.batch_worker.answer_preview(reply == QMessageBox.StandardButton.Yes)
+
+    def on_batch_failed(self, title, message):
+        QMessageBox.critical(self, title, message)
+
+    def on_batch_finished(self, summary):
+        self.batch_thread = None
+        self.batch_worker = None
+        self._set_batch_running(False)
+        if summary is None:
+            self.progress_bar.setRange(0, 1)
+            self.progress_bar.setValue(0)
+            self.status_label.setText("Batch stopped.")
             return
-        cc = self.cc_input.text().strip()
-        preview_mode = self.preview_checkbox.isChecked()
-        sent_count = 0
-        total_count = len(df)
-        self.log_message(f"Starting email batch for {total_count} records. Preview mode: {preview_mode}", logging.INFO)
-        for index, row in df.iterrows():
-            email_address = str(row['Email']).strip()
-            if not email_address:
-                self.log_message(f"Skipping row {index + 2}: Email address is missing.", logging.WARNING)
-                continue
-            self.log_message(f"Processing row {index + 2} for recipient: {email_address}", logging.DEBUG)
-            try:
-                mail = self.outlook_app.CreateItem(0)
-                mail.To = email_address
-                mail.CC = cc
-                supplier_name = str(row.get('Supplier Name', '')).strip()
-                final_subject = f"{supplier_name} - {base_subject}" if supplier_name else base_subject
-                mail.Subject = final_subject
-                updated_sig_html = self.embed_images_and_update_html(mail, sig_html_original, sig_files_dirpath)
-                greeting = str(row['Greeting']).strip()
-                greeting_html_part = f"<p>{greeting.rstrip(',')}," + "</p>" if greeting else ""
-                styled_body_content = f"""
-                <div style="font-family:Calibri, sans-serif; font-size:11pt;">
-                    {greeting_html_part}
-                    {body_html_from_ui}
-                </div>
-                """
-                final_html_body = styled_body_content + updated_sig_html
-                mail.HTMLBody = final_html_body
-                self.log_message(f"Final HTMLBody set for {email_address}.", logging.DEBUG)
-                attachment_path = row.get('Attachment', '')
-                attachment_note = self.try_attach_file(mail, attachment_path, email_address)
-                if preview_mode:
-                    mail.Display()
-                    reply = QMessageBox.question(
-                        self,
-                        "Confirm Send",
-                        f"Review the email for {email_address}.\n\n{attachment_note}\n\nDo you want to send it?",
-                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-                    )
-                    if reply == QMessageBox.StandardButton.Yes:
-                        mail.Send()
-                        self.log_message(f"SENT (after preview) to {email_address}", logging.INFO)
-                        sent_count += 1
-                    else:
-                        self.log_message(f"SKIPPED (after preview) sending to {email_address} by user.", logging.INFO)
-                else:
-                    mail.Send()
-                    self.log_message(f"SENT to {email_address}", logging.INFO)
-                    sent_count += 1
-            except pythoncom.com_error as e:
-                self.log_message(f"A COM Error occurred for {email_address}: {e}", logging.ERROR)
-            except Exception as e:
-                self.log_message(f"An unexpected error occurred for {email_address}: {e}", logging.ERROR)
-        summary_message = f"Email batch finished. Sent {sent_count} of {total_count} emails."
+        self.update_progress(summary.processed, summary.total)
+        prefix = "Email batch cancelled" if summary.cancelled else "Email batch finished"
+        summary_message = f"{prefix}. Sent {summary.sent} of {summary.total} emails."
         self.log_message(summary_message, logging.INFO)
-        QMessageBox.information(self, "Process Complete", f"{summary_message}\n\nA detailed log file has been saved to:\n{self.log_file_path}")
-        self.outlook_app = None
+        details = f"A detailed log file has been saved to:\n{self.log_file_path}"
+        if summary.already_sent:
+            details += f"\n\n{summary.already_sent} row(s) were skipped because they were sent in a previous run."
+        if summary.rejected_report:
+            details += f"\n\n{summary.rejected} row(s) failed pre-flight checks. See:\n{summary.rejected_report}"
+        if summary.report:
+            details += f"\n\nTiming report:\n{summary.report}"
+        QMessageBox.information(self, "Process Complete", f"{summary_message}\n\n{details}")
+
+    def closeEvent(self, event):
+        if self.batch_thread is not None:
+            self.batch_worker.cancel()
+            self.batch_thread.quit()
+            self.batch_thread.wait()
+        super().closeEvent(event)
 
     def show_help_dialog(self):
         dialog = QDialog(self)
@@ -376,6 +544,7 @@ class EmailSender(QWidget):
                 <ul>
                     <li>Fill in the <b>Subject</b>. This will be the base subject for all emails.</li>
                     <li>For the <b>Email Body</b>, compose your message in Microsoft Word or another editor, <b>copy it</b>, and then <b>paste it directly</b> into the text box. The font will be automatically set to Calibri 11.</li>
+                    <li><b>Placeholders:</b> Write <b>{{{{Column Name}}}}</b> in the subject or body to insert that column's value for each recipient, or <b>{{{{Column Name|fallback}}}}</b> to use a fallback when the cell is empty. Placeholders are checked against the Excel columns before anything is sent.</li>
                 </ul>
             </li>
             <li><b>Select Excel File:</b> Click to choose your spreadsheet of recipients.</li>
@@ -383,10 +552,12 @@ class EmailSender(QWidget):
                 <ul>
                     <li><b>Required:</b> A column named <b>Email</b>.</li>
                     <li><b>Optional:</b> A column named <b>Supplier Name</b>. The value from this column will be added to the start of the subject line (e.g., <i>Supplier Inc. - Your Subject</i>).</li>
+                    <li><b>Optional:</b> A column named <b>CC</b> with extra CC addresses for that row (separate with ';' or ',').</li>
                     <li><b>Optional:</b> A column named <b>Greeting</b> for a personalized opening (e.g., <i>Hi Mike,</i>).</li>
                     <li><b>Optional:</b> A column named <b>Attachment</b>. Provide the <u>full file path</u> for any attachments. <b>To add multiple attachments, separate each full path with a semicolon (;)</b>.</li>
                 </ul>
             </li>
+            <li><b>Resume:</b> Every send is recorded in a journal file next to the log. If a batch is interrupted, run the same list again with "Skip recipients already sent" checked to continue where it stopped. A send only counts as done for the same subject, attachment and message body, so a new campaign to the same list is sent in full.</li>
             <li><b>Preview (Recommended):</b> Check the "Preview" box to review each email before it is sent.</li>
             <li><b>Send:</b> Click "Start Sending Emails" to begin.</li>
         </ol><hr>
@@ -405,15 +576,15 @@ def _launch_with_splash():
     logging.info("Launching splash.")
     splash = WaveSplashScreen()
     splash.show()
+    QApplication.processEvents()
     main_window = EmailSender()
-    def handoff():
-        logging.info("Handoff: closing splash, showing main window.")
-        splash.close()
-        main_window.show()
-    QTimer.singleShot(2600, handoff)
+    logging.info("Handoff: closing splash, showing main window.")
+    main_window.show()
+    splash.close()
     return main_window
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = _launch_with_splash()
     sys.exit(app.exec())
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+STAGES = ("connect", "signature", "load", "preflight", "render", "inline_images", "html_body", "attachments", "encode",
+          "prepare", "send")
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = "mailops"
+
+
+class StageHistogram:
+    __slots__ = ("samples", "total", "_lock")
+
+    def __init__(self):
+        self.samples = array("d")
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+            self.total += seconds
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    def quantile(self, q: float, ordered=None) -> float:
+        ordered = ordered if ordered is not None else sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        with self._lock:
+            ordered = sorted(self.samples)
+            total = self.total
+        count = len(ordered)
+        summary = {"count": count, "total_seconds": total, "mean_seconds": total / count if count else 0.0}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}_seconds"] = self.quantile(q, ordered)
+        summary["max_seconds"] = ordered[-1] if ordered else 0.0
+        return summary
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "clock", "started")
+
+    def __init__(self, histogram, clock):
+        self.histogram = histogram
+        self.clock = clock
+
+    def __enter__(self):
+        self.started = self.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(self.clock() - self.started)
+
+
+class BatchMetrics:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> StageHistogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, StageHistogram())
+        return histogram
+
+    def observe(self, stage: str, seconds: float):
+        self.histogram(stage).observe(seconds)
+
+    def stage(self, stage: str):
+        return _StageTimer(self.histogram(stage), self.clock)
+
+    def export(self) -> dict:
+        return {name: histogram.samples for name, histogram in self.stages.items()}
+
+    def merge(self, samples: dict):
+        for name, values in samples.items():
+            histogram = self.histogram(name)
+            with histogram._lock:
+                histogram.samples.extend(values)
+                histogram.total += sum(values)
+
+    def summary(self) -> dict:
+        order = {name: i for i, name in enumerate(STAGES)}
+        names = sorted(self.stages, key=lambda name: (order.get(name, len(order)), name))
+        return {name: self.stages[name].summary() for name in names}
+
+
+class NullMetrics(BatchMetrics):
+    def observe(self, stage: str, seconds: float):
+        pass
+
+    def stage(self, stage: str):
+        return _NULL_TIMER
+
+
+_NULL_TIMER = nullcontext()
+NULL_METRICS = NullMetrics()
+
+
+def build_report(summary, metrics: BatchMetrics, elapsed: float, transport: str, started_at: float, **extra) -> dict:
+    report = {
+        "started_at": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        "elapsed_seconds": elapsed,
+        "transport": transport,
+        "total": summary.total,
+        "sent": summary.sent,
+        "skipped": summary.skipped,
+        "failed": summary.failed,
+        "rejected": summary.rejected,
+        "already_sent": summary.already_sent,
+        "cancelled": summary.cancelled,
+        "throughput_per_second": summary.sent / elapsed if elapsed > 0 else 0.0,
+    }
+    report.update(extra)
+    report["stages"] = metrics.summary()
+    return report
+
+
+def _write_atomically(path: str, text: str):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def write_json_report(path: str, report: dict):
+    _write_atomically(path, json.dumps(report, indent=2) + "\n")
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(report: dict) -> str:
+    p = PROMETHEUS_PREFIX
+    transport = f'transport="{_label(report["transport"])}"'
+    lines = [
+        f"# HELP {p}_batch_messages Messages in the last batch by outcome.",
+        f"# TYPE {p}_batch_messages gauge",
+    ]
+    for status in ("sent", "skipped", "failed", "rejected", "already_sent"):
+        lines.append(f'{p}_batch_messages{{{transport},status="{status}"}} {report[status]}')
+    lines += [
+        f"# HELP {p}_batch_duration_seconds Wall-clock duration of the last batch.",
+        f"# TYPE {p}_batch_duration_seconds gauge",
+        f"{p}_batch_duration_seconds{{{transport}}} {report['elapsed_seconds']:.6f}",
+        f"# HELP {p}_batch_throughput_messages_per_second Messages sent per second in the last batch.",
+        f"# TYPE {p}_batch_throughput_messages_per_second gauge",
+        f"{p}_batch_throughput_messages_per_second{{{transport}}} {report['throughput_per_second']:.6f}",
+        f"# HELP {p}_stage_seconds Time spent per stage in the last batch.",
+        f"# TYPE {p}_stage_seconds summary",
+    ]
+    for stage, stats in report["stages"].items():
+        labels = f'{transport},stage="{_label(stage)}"'
+        for q in QUANTILES:
+            lines.append(f'{p}_stage_seconds{{{labels},quantile="{q}"}} {stats[f"p{round(q * 100)}_seconds"]:.9f}')
+        lines.append(f"{p}_stage_seconds_sum{{{labels}}} {stats['total_seconds']:.9f}")
+        lines.append(f"{p}_stage_seconds_count{{{labels}}} {stats['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, report: dict):
+    _write_atomically(path, prometheus_text(report))
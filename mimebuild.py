@@ -0,0 +1,233 @@
+import base64
+import hashlib
+import mimetypes
+import mmap
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from email import policy
+from email.message import MIMEPart
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+
+from attachments import file_digest
+from metrics import NULL_METRICS
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_STREAM_THRESHOLD = 4 * 1024 * 1024
+BASE64_LINE_BYTES = 57  # 76 encoded characters per line
+ENCODE_CHUNK_BYTES = BASE64_LINE_BYTES * 16 * 1024
+CRLF = b"\r\n"
+
+
+def _dot_stuff(data: bytes) -> bytes:
+    if data.startswith(b"."):
+        data = b"." + data
+    data = data.replace(b"\r\n.", b"\r\n..")
+    return data if data.endswith(CRLF) else data + CRLF
+
+
+def _header_bytes(items) -> bytes:
+    fold = policy.SMTP.header_factory
+    return b"".join(fold(name, value).fold(policy=policy.SMTP).encode("ascii") for name, value in items)
+
+
+def guess_type(path: str):
+    mime_type, _ = mimetypes.guess_type(path)
+    if not mime_type:
+        return "application", "octet-stream"
+    maintype, subtype = mime_type.split("/", 1)
+    return maintype, subtype
+
+
+def iter_base64_file(path: str):
+    # Encodes through a read-only mapping one aligned chunk at a time, so a file is never held whole.
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for offset in range(0, size, ENCODE_CHUNK_BYTES):
+                yield base64.encodebytes(view[offset:offset + ENCODE_CHUNK_BYTES]).replace(b"\n", CRLF)
+
+
+def encoded_size(size: int) -> int:
+    lines = -(-size // BASE64_LINE_BYTES)
+    return -(-size // 3) * 4 + lines * len(CRLF)
+
+
+class StreamedFilePart:
+    __slots__ = ("headers", "path", "size")
+
+    def __init__(self, headers: bytes, path: str, size: int):
+        self.headers = headers
+        self.path = path
+        self.size = len(headers) + encoded_size(size)
+
+    def chunks(self):
+        yield self.headers
+        yield from iter_base64_file(self.path)
+
+
+class MimePayload:
+    # The message as it goes on the wire after DATA: dot-stuffed, CRLF line endings, no final ".".
+    __slots__ = ("parts",)
+
+    def __init__(self, parts):
+        self.parts = tuple(parts)
+
+    @property
+    def size(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.size for part in self.parts)
+
+    def chunks(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part.chunks()
+
+    def as_bytes(self) -> bytes:
+        return b"".join(self.chunks())
+
+
+class MimePartCache:
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._parts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build) -> bytes:
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+                self.hits += 1
+                return part
+            self.misses += 1
+        part = build()
+        if len(part) > self.max_bytes:
+            return part
+        with self._lock:
+            if key not in self._parts:
+                self._parts[key] = part
+                self.bytes += len(part)
+                while self.bytes > self.max_bytes:
+                    _, evicted = self._parts.popitem(last=False)
+                    self.bytes -= len(evicted)
+                    self.evictions += 1
+        return part
+
+    def __len__(self):
+        return len(self._parts)
+
+
+@lru_cache(maxsize=4096)
+def _part_headers(path: str, disposition: str, cid: str = "") -> bytes:
+    maintype, subtype = guess_type(path)
+    part = MIMEPart(policy=policy.SMTP)
+    part["Content-Type"] = f"{maintype}/{subtype}"
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", disposition, filename=os.path.basename(path))
+    if cid:
+        part["Content-ID"] = f"<{cid}>"
+    return b"".join(part.policy.fold_binary(name, value) for name, value in part.raw_items()) + CRLF
+
+
+class MessageBuilder:
+    # Serializes OutgoingMessages into MimePayloads whose body, image and attachment parts are
+    # content-addressed, so rows sharing a payload reuse one encoded copy from the cache.
+    def __init__(self, sender: str, cache: MimePartCache = None, stream_threshold: int = DEFAULT_STREAM_THRESHOLD):
+        self.sender = sender
+        self.cache = cache if cache is not None else MimePartCache()
+        self.stream_threshold = stream_threshold
+        self._boundaries = self._new_boundaries()
+
+    @staticmethod
+    def _new_boundaries():
+        return tuple(f"{'=' * 15}{secrets.token_hex(12)}==" for _ in range(2))
+
+    def _html_part(self, html_body: str) -> bytes:
+        digest = hashlib.sha256(html_body.encode("utf-8", "surrogatepass")).digest()
+
+        def build():
+            part = MIMEPart(policy=policy.SMTP)
+            part.set_content(html_body, subtype="html")
+            return _dot_stuff(part.as_bytes(policy=policy.SMTP))
+
+        return self.cache.get(("html", digest), build)
+
+    def _binary_part(self, key, headers: bytes, data: bytes = None, path: str = None):
+        def build():
+            if data is not None:
+                encoded = base64.encodebytes(data).replace(b"\n", CRLF)
+            else:
+                encoded = b"".join(iter_base64_file(path))
+            return headers + encoded
+
+        return self.cache.get(key, build)
+
+    def _image_part(self, image) -> bytes:
+        headers = _part_headers(image.path, "inline", cid=image.cid)
+        if image.digest:
+            digest = image.digest
+        elif image.data is not None:
+            digest = hashlib.sha256(image.data).hexdigest()
+        else:
+            st = os.stat(image.path)
+            digest = file_digest(image.path, st.st_size, st.st_mtime_ns)
+        return self._binary_part(("inline", digest, headers), headers, data=image.data, path=image.path)
+
+    def _attachment_part(self, path: str, info=None):
+        headers = _part_headers(path, "attachment")
+        if info is None:
+            st = os.stat(path)
+            size, mtime_ns, digest = st.st_size, st.st_mtime_ns, ""
+        else:
+            size, mtime_ns, digest = info.size, info.mtime_ns, info.sha256
+        if size > self.stream_threshold:
+            return StreamedFilePart(headers, path, size)
+        if not digest:
+            digest = file_digest(path, size, mtime_ns)
+        return self._binary_part(("file", digest, headers), headers, path=path)
+
+    @staticmethod
+    def _multipart(subtype: str, boundary: str, parts) -> list:
+        # Same layout as email.generator: every delimiter but the first starts with its own CRLF.
+        delimiter = f"\r\n--{boundary}\r\n".encode("ascii")
+        out = [_header_bytes([("Content-Type", f'multipart/{subtype}; boundary="{boundary}"')]), CRLF, delimiter[2:]]
+        for i, part in enumerate(parts):
+            if i:
+                out.append(delimiter)
+            out.extend(part)
+        out.append(f"\r\n--{boundary}--\r\n".encode("ascii"))
+        return out
+
+    def build(self, message, cc: str = "", metrics=NULL_METRICS) -> MimePayload:
+        with metrics.stage("html_body"):
+            body = self._html_part(message.html_body)
+        mixed, related = self._boundaries
+        if (mixed.encode("ascii") in body) or (related.encode("ascii") in body):
+            mixed, related = self._boundaries = self._new_boundaries()
+        content = [body]
+        if message.inline_images:
+            with metrics.stage("inline_images"):
+                images = [[self._image_part(image)] for image in message.inline_images]
+            content = self._multipart("related", related, [content] + images)
+        if message.attachments:
+            with metrics.stage("attachments"):
+                infos = message.attachment_infos or [None] * len(message.attachments)
+                files = [[self._attachment_part(path, info)] for path, info in zip(message.attachments, infos)]
+            content = self._multipart("mixed", mixed, [content] + files)
+        with metrics.stage("encode"):
+            headers = [("From", self.sender), ("To", message.to)]
+            if cc:
+                headers.append(("Cc", cc))
+            headers += [("Subject", message.subject), ("Date", formatdate(localtime=True)),
+                        ("Message-ID", make_msgid()), ("MIME-Version", "1.0")]
+            return MimePayload([_header_bytes(headers)] + content)
@@ -0,0 +1,193 @@
+import csv
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from templates import cell_text, compile_subject
+from transports import format_address, parse_addresses, split_addresses
+
+EMAIL_PATTERN = r"[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+@[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)+"
+EMAIL_RE = re.compile(EMAIL_PATTERN)
+ADDRESS_LIST_PATTERN = f"{EMAIL_PATTERN}(?:; {EMAIL_PATTERN})*"
+SEPARATOR_RUN = r"\s*(?:[;,]\s*)+"
+
+
+class PreflightError(Exception):
+    pass
+
+
+class PlannedMessage(NamedTuple):
+    row_number: int
+    to: str
+    cc: str
+    subject: str
+    attachment: str
+    row: object
+
+
+class RejectedRow(NamedTuple):
+    row_number: int
+    email: str
+    reason: str
+
+
+def normalize_addresses(value: str) -> list:
+    # Display forms such as "Jane Doe <jane@x.com>" are kept for the message; checks use the address part.
+    return [format_address(name, address) for name, address in parse_addresses(value)]
+
+
+def invalid_addresses(addresses) -> list:
+    return [address for address in addresses if not all(EMAIL_RE.fullmatch(part) for part in split_addresses(address))]
+
+
+def _normalize_address_column(series: pd.Series):
+    # Returns the cells in display form and their bare addresses. Plain address lists, by far the common
+    # case, stay on the vectorized path; cells with display names or quotes are parsed one by one.
+    display = (
+        series.str.replace(r"[<>]", "", regex=True)
+        .str.replace(SEPARATOR_RUN, "; ", regex=True)
+        .str.strip("; \t")
+    )
+    addresses = display.copy()
+    named = series.str.contains('[<"]', regex=True)
+    if named.any():
+        display.loc[named] = ["; ".join(normalize_addresses(value)) for value in series[named]]
+        addresses.loc[named] = ["; ".join(split_addresses(value)) for value in series[named]]
+    return display, addresses
+
+
+def _merge_addresses(*groups) -> str:
+    merged = {}
+    for group in groups:
+        for address in group:
+            merged.setdefault("; ".join(split_addresses(address)).casefold(), address)
+    return "; ".join(merged.values())
+
+
+def _text(frame: pd.DataFrame, column: str) -> pd.Series:
+    if column not in frame.columns:
+        return pd.Series("", index=frame.index, dtype=object)
+    # Cells are formatted like the body renders them, not from the dtype pandas infers for the column,
+    # so {{Date}} reads the same in the subject and the body.
+    values = frame[column]
+    return values.map(cell_text, na_action="ignore").where(values.notna(), "").astype(object)
+
+
+class Preflight:
+    def __init__(self, subject: str, cc: str = "", dedupe: bool = True, attachment_index=None):
+        self.subject = subject
+        self.subject_template = compile_subject(subject)
+        self.dedupe = dedupe
+        self.attachment_index = attachment_index
+        self.global_cc = normalize_addresses(cc)
+        bad = invalid_addresses(self.global_cc)
+        if bad:
+            raise PreflightError(f"Invalid CC address(es): {', '.join(bad)}")
+        self._seen = {}
+
+    def plan_rows(self, rows):
+        frame = pd.DataFrame.from_records([row.values for row in rows])
+        return self.plan(frame, [row.row_number for row in rows], rows)
+
+    def plan(self, frame: pd.DataFrame, row_numbers=None, rows=None):
+        if row_numbers is None:
+            row_numbers = np.arange(len(frame)) + 2
+        frame = frame.reset_index(drop=True)
+        numbers = pd.Series(np.asarray(row_numbers), index=frame.index)
+        raw_email = _text(frame, "Email")
+        reasons = pd.Series("", index=frame.index, dtype=object)
+
+        to, to_addresses = _normalize_address_column(raw_email)
+        reasons = reasons.mask(to_addresses == "", "Email address is missing.")
+        bad_to = (to_addresses != "") & ~to_addresses.str.fullmatch(ADDRESS_LIST_PATTERN)
+        if bad_to.any():
+            reasons.loc[bad_to] = [f"Invalid email address: {', '.join(invalid_addresses(v.split('; ')))}"
+                                   for v in to_addresses[bad_to]]
+
+        global_cc = "; ".join(self.global_cc)
+        cc = pd.Series(global_cc, index=frame.index, dtype=object)
+        if "CC" in frame.columns:
+            raw_cc = _text(frame, "CC")
+            row_cc, cc_addresses = _normalize_address_column(raw_cc)
+            has_cc = cc_addresses != ""
+            bad_cc = has_cc & ~cc_addresses.str.fullmatch(ADDRESS_LIST_PATTERN) & (reasons == "")
+            if bad_cc.any():
+                reasons.loc[bad_cc] = [f"Invalid CC address(es): {', '.join(invalid_addresses(v.split('; ')))}"
+                                       for v in cc_addresses[bad_cc]]
+            if has_cc.any():
+                cc.loc[has_cc] = [_merge_addresses(self.global_cc, normalize_addresses(v)) for v in raw_cc[has_cc]]
+
+        attachments = _text(frame, "Attachment")
+        if self.attachment_index is not None:
+            has_attachment = attachments != ""
+            if has_attachment.any():
+                self.attachment_index.add_cells(pd.unique(attachments[has_attachment]))
+                problems = self.attachment_index.problems()
+                if problems:
+                    problem = attachments.map(problems)
+                    flagged = problem.notna() & (reasons == "")
+                    reasons.loc[flagged] = problem[flagged]
+
+        candidates = np.flatnonzero((reasons == "").to_numpy())
+        candidate_frame = frame.iloc[candidates]
+        subjects = pd.Series(self.subject_template.render_columns(lambda column: _text(candidate_frame, column),
+                                                                  len(candidates)),
+                             index=frame.index[candidates], dtype=object)
+        if self.dedupe:
+            # Same identity as journal.row_key: one recipient may get several different messages from one list.
+            keys = to_addresses[subjects.index].str.casefold() + "\x1f" + subjects + "\x1f" + attachments[subjects.index]
+            candidate_numbers = numbers[subjects.index]
+            first = keys.map(self._seen).fillna(candidate_numbers.groupby(keys).transform("first"))
+            duplicate = first != candidate_numbers
+            reasons.loc[duplicate[duplicate].index] = (
+                "Duplicate message (same recipient, subject and attachment as row "
+                + first[duplicate].astype(int).astype(str) + ")."
+            )
+            self._seen.update(zip(keys[~duplicate], candidate_numbers[~duplicate].astype(int)))
+
+        accepted = (reasons == "").to_numpy()
+        keep = np.flatnonzero(accepted)
+        drop = np.flatnonzero(~accepted)
+        subjects = subjects[frame.index[keep]].tolist()
+        number_values = numbers.to_numpy()
+        plan = list(map(
+            PlannedMessage._make,
+            zip(
+                number_values[keep].tolist(),
+                to.to_numpy()[keep].tolist(),
+                cc.to_numpy()[keep].tolist(),
+                subjects,
+                attachments.to_numpy()[keep].tolist(),
+                [rows[i] for i in keep] if rows is not None else [None] * len(keep),
+            ),
+        ))
+        rejected = list(map(
+            RejectedRow._make,
+            zip(number_values[drop].tolist(), raw_email.to_numpy()[drop].tolist(), reasons.to_numpy()[drop].tolist()),
+        ))
+        return plan, rejected
+
+
+class RejectedReport:
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._handle = None
+        self._writer = None
+
+    def write(self, rejected):
+        if not rejected or not self.path:
+            return
+        if self._writer is None:
+            self._handle = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow(["Row", "Email", "Reason"])
+        self._writer.writerows(rejected)
+        self.count += len(rejected)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
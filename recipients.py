@@ -0,0 +1,245 @@
+import csv
+import hashlib
+import os
+import pickle
+import re
+import struct
+
+DEFAULT_COLUMNS = ('Attachment', 'Greeting', 'Supplier Name')
+DEFAULT_CHUNK_SIZE = 2000
+CSV_EXTENSIONS = ('.csv', '.txt')
+SPOOL_EXTENSION = '.mailops-rows'
+_SPOOL_COUNT = struct.Struct('>Q')
+SHARD_KEY_SEPARATORS = re.compile(r"[;,<>\s]+")
+
+
+class RecipientFileError(Exception):
+    pass
+
+
+class RecipientRow:
+    __slots__ = ('row_number', 'values')
+
+    def __init__(self, row_number: int, values: dict):
+        self.row_number = row_number
+        self.values = values
+
+    def get(self, column, default=''):
+        return self.values.get(column, default)
+
+    def __getitem__(self, column):
+        return self.values.get(column, '')
+
+    def __repr__(self):
+        return f"RecipientRow({self.row_number}, {self.values!r})"
+
+
+def shard_of(email, shards: int) -> int:
+    if shards <= 1:
+        return 0
+    key = " ".join(SHARD_KEY_SEPARATORS.split(str(email or ""))).strip().casefold()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") % shards
+
+
+def _clean_header(header):
+    columns = []
+    for i, name in enumerate(header):
+        name = '' if name is None else str(name).strip()
+        columns.append(name or f"Unnamed: {i}")
+    return columns
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:
+            return ''
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+class RecipientSpool:
+    # Rows already read from a recipients file, kept with their original row numbers, so a delivery
+    # session can read its share of a list without parsing the whole workbook again.
+    def __init__(self, path: str, columns, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.count = 0
+        self._chunk = []
+        self._handle = open(path, 'wb')
+        self._handle.write(_SPOOL_COUNT.pack(0))
+        pickle.dump(list(columns), self._handle, pickle.HIGHEST_PROTOCOL)
+
+    def write(self, row: RecipientRow):
+        self._chunk.append((row.row_number, row.values))
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._chunk:
+            pickle.dump(self._chunk, self._handle, pickle.HIGHEST_PROTOCOL)
+            self.count += len(self._chunk)
+            self._chunk = []
+
+    def close(self):
+        if self._handle is None:
+            return
+        self._flush()
+        self._handle.seek(0)
+        self._handle.write(_SPOOL_COUNT.pack(self.count))
+        self._handle.close()
+        self._handle = None
+
+
+class RecipientStream:
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.columns = []
+        self._width = 0
+        self.total_hint = None
+        self.rows_read = 0
+        self._rows = None
+        self._spooled = False
+        self._closers = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        ext = os.path.splitext(self.path)[1].lower()
+        try:
+            if ext == SPOOL_EXTENSION:
+                header, self._rows = self._open_spool()
+            elif ext in CSV_EXTENSIONS:
+                header, self._rows = self._open_csv()
+            elif ext == '.xls':
+                header, self._rows = self._open_legacy_excel()
+            else:
+                header, self._rows = self._open_xlsx()
+        except RecipientFileError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            raise RecipientFileError(str(e)) from e
+        self.columns = _clean_header(header)
+        self._width = len(self.columns)
+        if 'Email' not in self.columns:
+            self.close()
+            raise RecipientFileError("Excel file must contain an 'Email' column.")
+        for col in DEFAULT_COLUMNS:
+            if col not in self.columns:
+                self.columns.append(col)
+        return self
+
+    def close(self):
+        while self._closers:
+            self._closers.pop()()
+
+    def _open_xlsx(self):
+        import openpyxl
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        self._closers.append(workbook.close)
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise RecipientFileError("The sheet is empty.")
+        if sheet.max_row:
+            self.total_hint = max(0, sheet.max_row - 1)
+        return header, rows
+
+    def _open_csv(self):
+        encoding = 'utf-8-sig'
+        with open(self.path, 'rb') as f:
+            sample = f.read(65536)
+        try:
+            sample.decode(encoding)
+        except UnicodeDecodeError as e:
+            if e.start < len(sample) - 4:
+                encoding = 'cp1252'
+        handle = open(self.path, 'r', encoding=encoding, errors='replace', newline='')
+        self._closers.append(handle.close)
+        try:
+            dialect = csv.Sniffer().sniff(sample.decode(encoding, errors='replace'), delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        rows = csv.reader(handle, dialect)
+        header = next(rows, None)
+        if header is None:
+            raise RecipientFileError("The file is empty.")
+        self.total_hint = max(0, _count_lines(self.path) - 1)
+        return header, rows
+
+    def _open_spool(self):
+        handle = open(self.path, 'rb')
+        self._closers.append(handle.close)
+        (self.total_hint,) = _SPOOL_COUNT.unpack(handle.read(_SPOOL_COUNT.size))
+        header = pickle.load(handle)
+        self._spooled = True
+
+        def chunks():
+            while True:
+                try:
+                    yield pickle.load(handle)
+                except EOFError:
+                    return
+
+        return header, chunks()
+
+    def _open_legacy_excel(self):
+        import pandas as pd
+        df = pd.read_excel(self.path, dtype=object)
+        self.total_hint = len(df)
+        return list(df.columns), df.itertuples(index=False, name=None)
+
+    def __iter__(self):
+        return self.chunks()
+
+    def chunks(self):
+        if self._spooled:
+            for spooled in self._rows:
+                chunk = [RecipientRow(row_number, values) for row_number, values in spooled]
+                self.rows_read += len(chunk)
+                yield chunk
+            return
+        columns = self.columns
+        header = columns[:self._width]
+        chunk = []
+        row_number = 1
+        for raw in self._rows:
+            row_number += 1
+            if not any(value not in (None, '') for value in raw):
+                continue
+            values = dict.fromkeys(columns, '')
+            for name, value in zip(header, raw):
+                values[name] = _cell(value)
+            chunk.append(RecipientRow(row_number, values))
+            if len(chunk) >= self.chunk_size:
+                self.rows_read += len(chunk)
+                yield chunk
+                chunk = []
+        if chunk:
+            self.rows_read += len(chunk)
+            yield chunk
+
+
+def _count_lines(path):
+    count = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+    return count + (last != b'\n')
+
+
+def open_recipients(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> RecipientStream:
+    return RecipientStream(path, chunk_size).open()
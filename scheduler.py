@@ -0,0 +1,256 @@
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass
+
+from logpipeline import default_log
+from metrics import NULL_METRICS
+from transports import TransportError
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 0.0, burst: float = 1.0, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def set_rate(self, rate: float):
+        self._refill(self.clock())
+        self.rate = rate
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        now = self.clock()
+        self._refill(now)
+        if self.rate <= 0:
+            return 0.0
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptiveRate:
+    # Outcomes are judged over a sliding time window. Feedback from sends dispatched before the
+    # last rate change describes the old rate, so it is counted but never triggers another change.
+    def __init__(self, bucket: TokenBucket, min_rate: float = 0.2, max_rate: float = 0.0, decrease: float = 0.5,
+                 increase: float = 1.2, window: float = 2.0, error_threshold: float = 0.02, clean_windows: int = 3,
+                 clock=time.monotonic):
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.window = window
+        self.error_threshold = error_threshold
+        self.clean_windows = clean_windows
+        self.clock = clock
+        self.ceiling = 0.0
+        self._events = deque()
+        self._successes = 0
+        self._throttles = 0
+        self._first_sent = None
+        self._changed_at = clock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def _observe(self, throttled: int, sent_at):
+        now = self.clock()
+        if self._first_sent is None:
+            self._first_sent = now if sent_at is None else sent_at
+        self._events.append((now, throttled))
+        self._throttles += throttled
+        self._successes += not throttled
+        while self._events[0][0] < now - self.window:
+            _, old = self._events.popleft()
+            self._throttles -= old
+            self._successes -= not old
+        return now
+
+    def _counts_since(self, since: float):
+        successes = throttles = 0
+        for at, throttled in reversed(self._events):
+            if at < since:
+                break
+            throttles += throttled
+            successes += not throttled
+        return successes, throttles
+
+    def record_success(self, sent_at: float = None):
+        now = self._observe(0, sent_at)
+        rate = self.bucket.rate
+        if rate <= 0 or now - self._changed_at < self.window:
+            return
+        if self._throttles > self.error_threshold * (self._successes + self._throttles):
+            return
+        if self.ceiling and rate >= self.ceiling:
+            # Lifting the limit re-opens the flood, so only do it after a sustained clean run at the ceiling.
+            if self.max_rate <= 0 and now - self._changed_at >= self.window * self.clean_windows:
+                self._change(0.0, now)
+            return
+        new_rate = rate * self.increase
+        if self.ceiling:
+            new_rate = min(self.ceiling, new_rate)
+        if self.max_rate > 0:
+            new_rate = min(self.max_rate, new_rate)
+        if new_rate > rate:
+            self._change(new_rate, now)
+
+    def record_throttle(self, sent_at: float = None):
+        now = self._observe(1, sent_at)
+        if sent_at is not None and sent_at < self._changed_at:
+            return
+        since = max(self._changed_at, self._first_sent, now - self.window)
+        successes, throttles = self._counts_since(since)
+        fraction = throttles / (successes + throttles)
+        rate = self.bucket.rate
+        if rate <= 0:
+            # Seed from the attempt rate over the window; cut by the error fraction below, that is the
+            # rate the server actually accepted.
+            rate = (successes + throttles) / max(1e-3, now - since)
+        self.ceiling = rate if self.max_rate <= 0 else min(rate, self.max_rate)
+        self._change(max(self.min_rate, rate * max(self.decrease, 1.0 - fraction)), now)
+
+    def _change(self, rate, now):
+        self.bucket.set_rate(rate)
+        self._changed_at = now
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int, rng=random.random) -> float:
+        cap = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return cap / 2 + rng() * cap / 2
+
+
+class _Delivery:
+    __slots__ = ("draft", "context", "label", "attempts", "sent_at", "dispatched", "completed")
+
+    def __init__(self, draft, context, label):
+        self.draft = draft
+        self.context = context
+        self.label = label
+        self.attempts = 0
+        self.sent_at = 0.0
+        self.dispatched = 0.0
+        self.completed = 0.0
+
+    def mark_completed(self, future):
+        self.completed = time.perf_counter()
+
+
+class DeliveryScheduler:
+    def __init__(self, transport, rate_limit: float = 0.0, retry: RetryPolicy = None, log=default_log,
+                 clock=time.monotonic, sleep=time.sleep, rng=random.random, metrics=NULL_METRICS):
+        self.transport = transport
+        self.metrics = metrics
+        self.retry = retry or RetryPolicy()
+        self.log = log
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        self.bucket = TokenBucket(rate_limit, clock=clock)
+        self.adaptive = AdaptiveRate(self.bucket, max_rate=rate_limit, clock=clock)
+        self.retries = 0
+        self._inflight = {}
+        self._delayed = []
+        self._finished = deque()
+        self._seq = itertools.count()
+
+    @property
+    def pending(self):
+        return len(self._inflight) + len(self._delayed)
+
+    def submit(self, draft, context, label=""):
+        self._dispatch(_Delivery(draft, context, label))
+
+    def poll(self) -> list:
+        self._reap(block=False)
+        self._dispatch_due()
+        return self._take_finished()
+
+    def drain(self, cancelled: bool = False):
+        while self._inflight or self._delayed:
+            if cancelled and self._delayed:
+                for _, _, delivery, error in self._delayed:
+                    self._finished.append((delivery.context, error))
+                self._delayed.clear()
+            self._dispatch_due()
+            timeout = None
+            if self._delayed:
+                timeout = max(0.0, self._delayed[0][0] - self.clock())
+            if self._inflight:
+                self._reap(block=True, timeout=timeout)
+            elif timeout:
+                self.sleep(timeout)
+            yield from self._take_finished()
+        yield from self._take_finished()
+
+    def _take_finished(self):
+        finished = list(self._finished)
+        self._finished.clear()
+        return finished
+
+    def _dispatch(self, delivery):
+        while len(self._inflight) >= self.transport.max_in_flight:
+            self._reap(block=True)
+        delay = self.bucket.reserve()
+        if delay > 0:
+            self.sleep(delay)
+        delivery.attempts += 1
+        delivery.sent_at = self.clock()
+        delivery.dispatched = time.perf_counter()
+        future = self.transport.submit_async(delivery.draft)
+        future.add_done_callback(delivery.mark_completed)
+        self._inflight[future] = delivery
+
+    def _dispatch_due(self):
+        now = self.clock()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, delivery, _ = heapq.heappop(self._delayed)
+            self._dispatch(delivery)
+            now = self.clock()
+
+    def _reap(self, block: bool, timeout=None):
+        if not self._inflight:
+            return
+        if block:
+            done, _ = wait(list(self._inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in self._inflight if future.done()]
+        for future in done:
+            delivery = self._inflight.pop(future)
+            # The done callback can still be running on the worker thread when wait() returns.
+            completed = delivery.completed or time.perf_counter()
+            self.metrics.observe("send", completed - delivery.dispatched)
+            error = future.exception()
+            if error is None:
+                self.adaptive.record_success(delivery.sent_at)
+                self._finished.append((delivery.context, None))
+            elif isinstance(error, TransportError) and error.transient and delivery.attempts <= self.retry.max_retries:
+                # A greylisted or temporarily full mailbox only delays its own message; only server pushback
+                # lowers the rate for the whole batch.
+                if error.throttled:
+                    self.adaptive.record_throttle(delivery.sent_at)
+                self.retries += 1
+                delay = self.retry.delay(delivery.attempts, self.rng)
+                rate = f"{self.bucket.rate:.2f} msg/s" if self.bucket.rate > 0 else "unlimited"
+                self.log(f"Transient failure for {delivery.label}: {error}. Retry {delivery.attempts} of "
+                         f"{self.retry.max_retries} in {delay:.1f}s (send rate now {rate}).", logging.WARNING)
+                heapq.heappush(self._delayed, (self.clock() + delay, next(self._seq), delivery, error))
+            else:
+                self._finished.append((delivery.context, error))
@@ -0,0 +1,282 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+import time
+from dataclasses import replace
+
+from attachments import AttachmentIndex
+from batch import BatchError, BatchJob, BatchRunner, BatchSummary, load_recipients, write_batch_report
+from logpipeline import default_log
+from metrics import BatchMetrics
+from recipients import SPOOL_EXTENSION, RecipientFileError, RecipientSpool, shard_of
+from transports import TransportSpec
+
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 0.25
+CONTROL_INTERVAL = 0.2
+
+
+def shard_file_path(path: str, index: int) -> str:
+    if not path:
+        return ""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard{index + 1}{ext}"
+
+
+class _EventSender:
+    def __init__(self, events, index: int):
+        self.events = events
+        self.index = index
+        self.pending = []
+        self.flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def log(self, message, level=logging.INFO):
+        if level >= logging.INFO:
+            self._add(("log", level, message))
+
+    def result(self, result):
+        self._add(("result", result))
+
+    def _add(self, event):
+        with self._lock:
+            self.pending.append(event)
+            if len(self.pending) < FLUSH_EVERY and time.monotonic() - self.flushed < FLUSH_INTERVAL:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            self.flushed = time.monotonic()
+            if self.pending:
+                self.events.put(("events", self.index, self.pending))
+                self.pending = []
+
+
+def _watch_controls(runner, sender, cancel, resume, finished):
+    # Also flushes buffered events so a paused or slow shard does not hold back progress.
+    while not finished.is_set():
+        sender.flush()
+        if cancel.wait(CONTROL_INTERVAL):
+            runner.cancel()
+            return
+        if resume.is_set():
+            if runner.paused:
+                runner.resume()
+        elif not runner.paused:
+            runner.pause()
+
+
+def _run_shard(job: BatchJob, spec: TransportSpec, index: int, events, cancel, resume, attachment_files):
+    # Ctrl+C reaches the whole process group; let the parent turn it into an orderly cancel.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sender = _EventSender(events, index)
+    metrics = BatchMetrics()
+    try:
+        runner = BatchRunner(job, spec.create(), log=sender.log, on_result=sender.result, metrics=metrics)
+    except Exception as e:
+        events.put(("failed", index, "Error", f"Could not start the delivery session.\nError: {e}"))
+        return
+    # The parent already inspected and hashed every attachment; pre-flight only resolves cells against these.
+    runner.attachments.files.update(attachment_files)
+    finished = threading.Event()
+    threading.Thread(target=_watch_controls, args=(runner, sender, cancel, resume, finished), daemon=True).start()
+    try:
+        summary = runner.run()
+    except BatchError as e:
+        sender.flush()
+        events.put(("failed", index, e.title, str(e)))
+        return
+    except Exception as e:
+        sender.log(f"CRITICAL: Batch stopped unexpectedly. Error: {e}", logging.ERROR)
+        sender.flush()
+        events.put(("failed", index, "Error", f"The batch stopped unexpectedly.\nError: {e}"))
+        return
+    finally:
+        finished.set()
+    sender.flush()
+    events.put(("done", index, summary, metrics.export(), runner.transport.name))
+
+
+class ShardedBatchRunner:
+    def __init__(self, job: BatchJob, spec: TransportSpec, workers: int, log=default_log, on_progress=None,
+                 on_result=None, metrics=None):
+        self.job = job
+        self.spec = spec
+        self.workers = max(1, workers)
+        self.log = log
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.metrics = metrics if metrics is not None else BatchMetrics()
+        self.summary = BatchSummary()
+        self._context = multiprocessing.get_context("spawn")
+        self._cancel = self._context.Event()
+        self._resume = self._context.Event()
+        self._resume.set()
+        self._processed = 0
+        self._transport_name = "Mail"
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def cancel(self):
+        self._cancel.set()
+        self._resume.set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self) -> BatchSummary:
+        job = self.job
+        if job.preview:
+            raise BatchError("Preview Unavailable", "Preview mode cannot be combined with parallel sessions.")
+        started_at = time.time()
+        started = time.perf_counter()
+        summaries = {}
+        failures = {}
+        with tempfile.TemporaryDirectory(prefix="mailops-shards-") as directory:
+            paths = [os.path.join(directory, f"shard{index + 1}{SPOOL_EXTENSION}") for index in range(self.workers)]
+            counts, attachment_files = self._partition(paths)
+            total_hint = sum(counts)
+            self.summary.total = total_hint
+            if self.cancelled:
+                self.summary.cancelled = True
+                self.log("Batch cancelled by user before any message was sent.", logging.WARNING)
+                return self.summary
+            events = self._context.Queue()
+            processes = []
+            for index in range(self.workers):
+                shard_job = replace(
+                    job, excel_path=paths[index], rate_limit=job.rate_limit / self.workers,
+                    rejected_report_path=shard_file_path(job.rejected_report_path, index), report_path="",
+                    prometheus_path="",
+                )
+                process = self._context.Process(
+                    target=_run_shard, name=f"mailops-shard-{index + 1}",
+                    args=(shard_job, self.spec, index, events, self._cancel, self._resume, attachment_files),
+                )
+                process.start()
+                processes.append(process)
+            self.log(f"Started {self.workers} delivery sessions for {total_hint} records.", logging.INFO)
+            try:
+                self._collect(events, processes, summaries, failures)
+            finally:
+                if len(summaries) + len(failures) < len(processes):
+                    self._cancel.set()
+                for process in processes:
+                    process.join(timeout=30)
+                    if process.is_alive():
+                        process.terminate()
+        if failures and not summaries:
+            title, message = failures[min(failures)]
+            raise BatchError(title, message)
+        self._merge(summaries, total_hint)
+        write_batch_report(job, self.summary, self.metrics, time.perf_counter() - started, started_at, self._transport_name,
+                           self.log, workers=self.workers, failed_sessions=len(failures))
+        return self.summary
+
+    def _partition(self, paths):
+        # Reads the workbook once and gives each session a spool of its own rows, so no session parses the
+        # whole list. Rows are split by recipient address, which keeps duplicates within one session's dedupe.
+        job = self.job
+        cells = set()
+        with load_recipients(job.excel_path, job.chunk_size) as stream:
+            spools = [RecipientSpool(path, stream.columns, job.chunk_size) for path in paths]
+            try:
+                for chunk in stream:
+                    if self.cancelled:
+                        break
+                    for row in chunk:
+                        spools[shard_of(row.get("Email"), len(spools))].write(row)
+                        cell = str(row.get("Attachment")).strip()
+                        if cell:
+                            cells.add(cell)
+            except RecipientFileError as e:
+                self.log(f"ERROR reading Excel file: {e}", logging.ERROR)
+                raise BatchError("Excel Error", f"Failed to read the Excel file.\nError: {e}") from e
+            finally:
+                for spool in spools:
+                    spool.close()
+        attachments = AttachmentIndex(job.max_attachment_bytes, log=self.log)
+        attachments.add_cells(sorted(cells))
+        return [spool.count for spool in spools], attachments.files
+
+    def _collect(self, events, processes, summaries, failures):
+        pending = set(range(len(processes)))
+        while pending:
+            try:
+                kind, index, *payload = events.get(timeout=0.5)
+            except queue.Empty:
+                for index in sorted(pending):
+                    if not processes[index].is_alive():
+                        pending.discard(index)
+                        failures[index] = ("Error", f"Delivery session {index + 1} stopped unexpectedly "
+                                                    f"(exit code {processes[index].exitcode}).")
+                        self.log(failures[index][1], logging.ERROR)
+                continue
+            if kind == "events":
+                for event in payload[0]:
+                    if event[0] == "log":
+                        self.log(event[2], event[1])
+                    else:
+                        self._result(event[1])
+            elif kind == "done":
+                summary, samples, self._transport_name = payload
+                summaries[index] = summary
+                self.metrics.merge(samples)
+                pending.discard(index)
+            elif kind == "failed":
+                title, message = payload
+                failures[index] = (title, message)
+                self.log(f"Delivery session {index + 1} failed. {title}: {message}", logging.ERROR)
+                pending.discard(index)
+
+    def _result(self, result):
+        self._processed += 1
+        if self.on_result is not None:
+            self.on_result(result)
+        if self.on_progress is not None:
+            self.on_progress(self._processed, max(self.summary.total, self._processed))
+
+    def _merge(self, summaries, total_hint):
+        summary = self.summary
+        for part in summaries.values():
+            summary.sent += part.sent
+            summary.skipped += part.skipped
+            summary.failed += part.failed
+            summary.rejected += part.rejected
+            summary.already_sent += part.already_sent
+            summary.cancelled = summary.cancelled or part.cancelled
+        complete = len(summaries) == self.workers and not summary.cancelled
+        summary.total = sum(part.total for part in summaries.values()) if complete else (total_hint or summary.processed)
+        reports = [summaries[index].rejected_report for index in sorted(summaries) if summaries[index].rejected_report]
+        if reports:
+            summary.rejected_report = self._merge_rejected_reports(reports)
+
+    def _merge_rejected_reports(self, paths):
+        target = self.job.rejected_report_path
+        try:
+            with open(target, "w", encoding="utf-8", newline="") as merged:
+                for i, path in enumerate(paths):
+                    with open(path, "r", encoding="utf-8", newline="") as part:
+                        header = part.readline()
+                        if i == 0:
+                            merged.write(header)
+                        merged.writelines(part)
+                    os.remove(path)
+        except OSError as e:
+            self.log(f"Could not merge the rejected-row reports: {e}", logging.WARNING)
+            return paths[0]
+        return target
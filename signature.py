@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import urllib.parse
+from dataclasses import dataclass
+
+from logpipeline import default_log
+from transports import InlineImage
+
+SRC_ATTRIBUTE = re.compile(r'src=(["\'])([^"\']*)\1', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PreparedSignature:
+    html: str = ""
+    inline_images: tuple = ()
+    source_path: str = ""
+    stamp: tuple = ()
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def signature_stamp(sig_path, sig_files_dirpath):
+    assets = ()
+    if sig_files_dirpath and os.path.isdir(sig_files_dirpath):
+        with os.scandir(sig_files_dirpath) as entries:
+            assets = tuple(sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries if entry.is_file()
+            ))
+    return sig_path, _file_stamp(sig_path), sig_files_dirpath, assets
+
+
+def outlook_signature_dir():
+    return os.path.join(os.getenv("APPDATA", ""), "Microsoft", "Signatures")
+
+
+def latest_signature_file(sig_dir) -> str:
+    htm_files = [f for f in os.listdir(sig_dir) if f.endswith(".htm")]
+    if not htm_files:
+        return ""
+    return os.path.join(sig_dir, max(htm_files, key=lambda f: os.path.getmtime(os.path.join(sig_dir, f))))
+
+
+def signature_files_dir(sig_path):
+    return f"{os.path.splitext(sig_path)[0]}_files"
+
+
+def read_signature_html(sig_path, log=default_log):
+    try:
+        with open(sig_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        log(f"Signature file {sig_path} not UTF-8, trying cp1252.", logging.DEBUG)
+        with open(sig_path, "r", encoding="cp1252") as f:
+            return f.read()
+
+
+def embed_images_and_update_html(signature_html, sig_files_dirpath, log=default_log):
+    log("Embedding signature images.", logging.DEBUG)
+    if not signature_html or not sig_files_dirpath or not os.path.isdir(sig_files_dirpath):
+        log("Signature HTML empty or assets missing, using original HTML.", logging.WARNING)
+        return signature_html, ()
+    html_relative_folder_name = os.path.basename(sig_files_dirpath)
+    referenced_files = {f.lower() for f in re.findall(r'src=["\'](?:[^"\']*/)?([^"\']+)["\']', signature_html, re.IGNORECASE)}
+    cid_by_src = {}
+    inline_images = []
+    for image_filename in sorted(os.listdir(sig_files_dirpath)):
+        if image_filename.lower() not in referenced_files:
+            continue
+        image_path = os.path.join(sig_files_dirpath, image_filename)
+        try:
+            with open(image_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            log(f"Failed to embed image '{image_filename}': {e}", logging.ERROR)
+            continue
+        cid = image_filename
+        inline_images.append(InlineImage(cid=cid, path=image_path, data=data, digest=hashlib.sha256(data).hexdigest()))
+        cid_by_src[f"{html_relative_folder_name}/{image_filename}"] = cid
+        cid_by_src[f"{html_relative_folder_name}/{urllib.parse.quote(image_filename)}"] = cid
+
+    def to_cid(match):
+        cid = cid_by_src.get(match.group(2))
+        if cid is None:
+            return match.group(0)
+        quote = match.group(1)
+        return f"src={quote}cid:{cid}{quote}"
+
+    return SRC_ATTRIBUTE.sub(to_cid, signature_html), tuple(inline_images)
+
+
+class SignatureCache:
+    def __init__(self):
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self, sig_path, sig_files_dirpath, log=default_log) -> PreparedSignature:
+        stamp = signature_stamp(sig_path, sig_files_dirpath)
+        with self._lock:
+            if self._entry is not None and self._entry.stamp == stamp:
+                log(f"Reusing cached signature for {sig_path}.", logging.DEBUG)
+                return self._entry
+            html, inline_images = embed_images_and_update_html(read_signature_html(sig_path, log), sig_files_dirpath, log)
+            self._entry = PreparedSignature(html=html, inline_images=inline_images, source_path=sig_path, stamp=stamp)
+            return self._entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
@@ -0,0 +1,119 @@
+import html
+import re
+from typing import NamedTuple
+
+PLACEHOLDER = re.compile(r"\{\{(.*?)\}\}", re.DOTALL)
+BODY_PREFIX = '<div style="font-family:Calibri, sans-serif; font-size:11pt;">\n'
+BODY_SUFFIX = '\n</div>\n'
+
+
+class TemplateError(Exception):
+    pass
+
+
+class Field(NamedTuple):
+    column: str
+    default: str = ""
+    transform: object = None
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    return (value if isinstance(value, str) else str(value)).strip()
+
+
+def greeting_paragraph(value: str) -> str:
+    return f"<p>{value.rstrip(',')},</p>" if value else ""
+
+
+def supplier_prefix(value: str) -> str:
+    return f"{value} - " if value else ""
+
+
+class CompiledTemplate:
+    __slots__ = ("statics", "fields", "escape", "_steps")
+
+    def __init__(self, statics, fields, escape: bool = False):
+        if len(statics) != len(fields) + 1:
+            raise ValueError("A template needs exactly one more static segment than fields.")
+        self.statics = tuple(statics)
+        self.fields = tuple(fields)
+        self.escape = escape
+        self._steps = tuple(zip(self.fields, self.statics[1:]))
+
+    @property
+    def columns(self) -> tuple:
+        return tuple(dict.fromkeys(field.column for field in self.fields))
+
+    def missing(self, available, with_defaults: bool = False) -> list:
+        available = set(available)
+        return list(dict.fromkeys(
+            field.column for field in self.fields
+            if field.column not in available and (with_defaults or not field.default)
+        ))
+
+    def prepend(self, field: Field, separator: str = "") -> "CompiledTemplate":
+        return CompiledTemplate(("", separator + self.statics[0]) + self.statics[1:], (field,) + self.fields, self.escape)
+
+    def wrap(self, prefix: str = "", suffix: str = "") -> "CompiledTemplate":
+        statics = list(self.statics)
+        statics[0] = prefix + statics[0]
+        statics[-1] = statics[-1] + suffix
+        return CompiledTemplate(statics, self.fields, self.escape)
+
+    def _value(self, field, text):
+        text = text or field.default
+        if self.escape:
+            text = html.escape(text)
+        return field.transform(text) if field.transform is not None else text
+
+    def render(self, values) -> str:
+        if not self._steps:
+            return self.statics[0]
+        parts = [self.statics[0]]
+        for field, static in self._steps:
+            parts.append(self._value(field, cell_text(values.get(field.column))))
+            parts.append(static)
+        return "".join(parts)
+
+    def render_columns(self, column, length: int):
+        if not self._steps:
+            return [self.statics[0]] * length
+        result = None
+        for field, static in self._steps:
+            values = column(field.column).map(lambda text, field=field: self._value(field, text))
+            result = (values if result is None else result + values) + static
+        return (self.statics[0] + result).tolist() if self.statics[0] else result.tolist()
+
+
+def compile_template(source: str, escape: bool = False) -> CompiledTemplate:
+    statics = []
+    fields = []
+    position = 0
+    for match in PLACEHOLDER.finditer(source or ""):
+        name, _, default = match.group(1).partition("|")
+        if escape:
+            name, default = html.unescape(name), html.unescape(default)
+        name = " ".join(name.split())
+        if not name:
+            raise TemplateError(f"Empty placeholder '{match.group(0)}' in template.")
+        statics.append(source[position:match.start()])
+        fields.append(Field(name, default.strip()))
+        position = match.end()
+    statics.append((source or "")[position:])
+    return CompiledTemplate(statics, fields, escape)
+
+
+def compile_subject(subject: str) -> CompiledTemplate:
+    template = compile_template(subject)
+    if "Supplier Name" not in template.columns:
+        template = template.prepend(Field("Supplier Name", transform=supplier_prefix))
+    return template
+
+
+def compile_body(body_html: str, signature_html: str = "") -> CompiledTemplate:
+    template = compile_template(body_html, escape=True)
+    if "Greeting" not in template.columns:
+        template = template.prepend(Field("Greeting", transform=greeting_paragraph), "\n")
+    return template.wrap(BODY_PREFIX, BODY_SUFFIX + signature_html)
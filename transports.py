@@ -0,0 +1,424 @@
+import re
+import ssl
+import queue
+import smtplib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from metrics import NULL_METRICS
+from mimebuild import DEFAULT_CACHE_BYTES, DEFAULT_STREAM_THRESHOLD, MessageBuilder, MimePartCache
+
+PR_ATTACH_CONTENT_ID = "http://schemas.microsoft.com/mapi/proptag/0x3712001F"
+BUSY_COM_ERRORS = {
+    -2147418111,  # RPC_E_CALL_REJECTED
+    -2147417846,  # RPC_E_SERVERCALL_RETRYLATER
+}
+TRANSIENT_COM_ERRORS = BUSY_COM_ERRORS | {
+    -2147221227,  # MAPI_E_NETWORK_ERROR
+    -2147220223,  # MAPI_E_TIMEOUT
+    -2147467260,  # E_ABORT
+}
+ADDRESS_SEPARATORS = re.compile(r"[;,]")
+ADDRESS_LIST_ITEM = re.compile(r'(?:"[^"]*"|[^;,"]|")+')
+NAMED_ADDRESS = re.compile(r'(?P<name>.*?)\s*<\s*(?P<address>[^<>]*?)\s*>')
+NAME_SPECIALS = re.compile(r'[,;:"()<>@\[\]\\]')
+SEND_BUFFER_BYTES = 64 * 1024
+
+
+class TransportError(Exception):
+    # throttled marks pushback from the server as a whole (SMTP 421, Outlook busy), as opposed to a
+    # problem with this one message; only throttled errors should slow the batch down.
+    def __init__(self, message, transient=False, throttled=False):
+        super().__init__(message)
+        self.transient = transient or throttled
+        self.throttled = throttled
+
+
+@dataclass
+class InlineImage:
+    cid: str
+    path: str
+    data: bytes = None
+    digest: str = ""
+
+
+@dataclass
+class OutgoingMessage:
+    to: str
+    subject: str
+    html_body: str
+    cc: str = ""
+    attachments: list = field(default_factory=list)
+    inline_images: list = field(default_factory=list)
+    # AttachmentInfo for each path in attachments, when pre-flight already has it; spares a stat per row.
+    attachment_infos: list = field(default_factory=list)
+
+
+def parse_addresses(value: str) -> list:
+    # (display name, address) pairs from a cell such as 'Jane Doe <jane@x.com>; "Doe, John" <john@x.com>'.
+    # Anything that is not in name <address> form is kept whole as the address, so it can be reported as invalid.
+    value = value or ""
+    parts = ADDRESS_LIST_ITEM.findall(value) if '"' in value else ADDRESS_SEPARATORS.split(value)
+    pairs = []
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        match = NAMED_ADDRESS.fullmatch(part)
+        if match:
+            pairs.append((match.group("name").strip().strip('"').strip(), match.group("address")))
+        else:
+            pairs.append(("", part.strip("<>").strip()))
+    return pairs
+
+
+def format_address(name: str, address: str) -> str:
+    if not name:
+        return address
+    if NAME_SPECIALS.search(name):
+        name = '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return f"{name} <{address}>"
+
+
+def split_addresses(value: str) -> list:
+    return [address for _, address in parse_addresses(value)]
+
+
+class MailTransport:
+    name = "Mail"
+    supports_preview = False
+    max_in_flight = 1
+    metrics = NULL_METRICS
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def prepare(self, message: OutgoingMessage):
+        raise NotImplementedError
+
+    def display(self, draft):
+        raise TransportError(f"Preview is not supported by the {self.name} delivery method.")
+
+    def submit(self, draft):
+        raise NotImplementedError
+
+    def submit_async(self, draft) -> Future:
+        future = Future()
+        try:
+            future.set_result(self.submit(draft))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def send(self, message: OutgoingMessage):
+        return self.submit(self.prepare(message))
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _com_error_codes(error) -> set:
+    args = getattr(error, "args", ())
+    codes = {args[0]} if args else set()
+    if len(args) > 2 and args[2] and len(args[2]) > 5:
+        codes.add(args[2][5])
+    return codes
+
+
+def _com_error_is_transient(error) -> bool:
+    return bool(_com_error_codes(error) & TRANSIENT_COM_ERRORS)
+
+
+class OutlookTransport(MailTransport):
+    name = "Outlook"
+    supports_preview = True
+
+    def __init__(self, application=None, com_error=()):
+        self.application = application
+        self._com_error = com_error
+        self._pythoncom = None
+
+    def open(self):
+        if self.application is None:
+            import pythoncom
+            import win32com.client
+            pythoncom.CoInitialize()
+            self._pythoncom = pythoncom
+            self._com_error = pythoncom.com_error
+            self.application = win32com.client.Dispatch("Outlook.Application")
+
+    def close(self):
+        self.application = None
+        if self._pythoncom is not None:
+            self._pythoncom.CoUninitialize()
+            self._pythoncom = None
+
+    def prepare(self, message: OutgoingMessage):
+        metrics = self.metrics
+        try:
+            mail = self.application.CreateItem(0)
+            mail.To = message.to
+            mail.CC = message.cc
+            mail.Subject = message.subject
+            with metrics.stage("inline_images"):
+                for image in message.inline_images:
+                    attachment = mail.Attachments.Add(image.path)
+                    attachment.PropertyAccessor.SetProperty(PR_ATTACH_CONTENT_ID, image.cid)
+            with metrics.stage("html_body"):
+                mail.HTMLBody = message.html_body
+            if message.attachments:
+                with metrics.stage("attachments"):
+                    for path in message.attachments:
+                        mail.Attachments.Add(path)
+            return mail
+        except self._com_error as e:
+            raise TransportError(f"A COM Error occurred: {e}") from e
+
+    def display(self, draft):
+        try:
+            draft.Display()
+        except self._com_error as e:
+            raise TransportError(f"A COM Error occurred: {e}") from e
+
+    def submit(self, draft):
+        try:
+            draft.Send()
+        except self._com_error as e:
+            raise TransportError(f"A COM Error occurred: {e}", transient=_com_error_is_transient(e),
+                                 throttled=bool(_com_error_codes(e) & BUSY_COM_ERRORS)) from e
+
+
+@dataclass
+class SmtpSettings:
+    host: str = "localhost"
+    port: int = 25
+    username: str = ""
+    password: str = ""
+    sender: str = ""
+    starttls: bool = False
+    use_ssl: bool = False
+    pool_size: int = 4
+    timeout: float = 30.0
+    max_messages_per_connection: int = 0
+    mime_cache_bytes: int = DEFAULT_CACHE_BYTES
+    stream_threshold: int = DEFAULT_STREAM_THRESHOLD
+
+
+class SmtpConnectionPool:
+    def __init__(self, factory, size: int):
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._factory()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        if discard:
+            _close_quietly(conn)
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                _close_quietly(conn)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except OSError:
+        pass
+
+
+class SmtpTransport(MailTransport):
+    name = "SMTP"
+
+    def __init__(self, settings: SmtpSettings):
+        self.settings = settings
+        self.max_in_flight = max(1, settings.pool_size) * 2
+        self.builder = MessageBuilder(settings.sender, MimePartCache(settings.mime_cache_bytes), settings.stream_threshold)
+        self._pool = None
+        self._executor = None
+
+    def open(self):
+        if not self.settings.sender:
+            raise TransportError("An SMTP sender (From) address is required.")
+        self._pool = SmtpConnectionPool(self._connect, self.settings.pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.settings.pool_size), thread_name_prefix="smtp")
+        conn = self._pool.acquire()
+        self._pool.release(conn)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _connect(self):
+        s = self.settings
+        try:
+            if s.use_ssl:
+                conn = smtplib.SMTP_SSL(s.host, s.port, timeout=s.timeout, context=ssl.create_default_context())
+            else:
+                conn = smtplib.SMTP(s.host, s.port, timeout=s.timeout)
+                if s.starttls:
+                    conn.starttls(context=ssl.create_default_context())
+            conn.ehlo_or_helo_if_needed()
+            if s.username:
+                conn.login(s.username, s.password)
+        except (smtplib.SMTPException, OSError) as e:
+            raise TransportError(f"Could not open SMTP session to {s.host}:{s.port}: {e}", transient=True) from e
+        conn.mailops_sent = 0
+        return conn
+
+    def prepare(self, message: OutgoingMessage):
+        # Bodies and attachments shared between rows are encoded once and reused from the builder's cache.
+        cc_list = parse_addresses(message.cc)
+        payload = self.builder.build(message, ", ".join(format_address(*pair) for pair in cc_list), self.metrics)
+        return self.settings.sender, split_addresses(message.to) + [address for _, address in cc_list], payload
+
+    def submit(self, draft):
+        sender, recipients, payload = draft
+        limit = self.settings.max_messages_per_connection
+        for attempt in range(2):
+            conn = self._pool.acquire()
+            try:
+                self._send_pipelined(conn, sender, recipients, payload)
+            # SMTPException subclasses OSError, so the server's own replies must be caught before socket errors.
+            except smtplib.SMTPServerDisconnected as e:
+                self._pool.release(conn, discard=True)
+                if attempt == 0:
+                    continue
+                raise TransportError(f"SMTP connection lost: {e}", transient=True) from e
+            except smtplib.SMTPRecipientsRefused as e:
+                self._pool.release(conn)
+                transient = all(400 <= code < 500 for code, _ in e.recipients.values())
+                raise TransportError(f"All recipients refused: {e.recipients}", transient=transient) from e
+            except smtplib.SMTPResponseException as e:
+                self._pool.release(conn, discard=e.smtp_code == 421)
+                raise TransportError(f"SMTP error {e.smtp_code}: {e.smtp_error!r}", transient=400 <= e.smtp_code < 500,
+                                     throttled=e.smtp_code == 421) from e
+            except OSError as e:
+                self._pool.release(conn, discard=True)
+                if attempt == 0:
+                    continue
+                raise TransportError(f"SMTP connection lost: {e}", transient=True) from e
+            except BaseException:
+                self._pool.release(conn, discard=True)
+                raise
+            conn.mailops_sent += 1
+            self._pool.release(conn, discard=bool(limit) and conn.mailops_sent >= limit)
+            return
+
+    def submit_async(self, draft) -> Future:
+        return self._executor.submit(self.submit, draft)
+
+    @staticmethod
+    def _send_pipelined(conn, sender, recipients, payload):
+        conn.ehlo_or_helo_if_needed()
+        if not conn.has_extn("pipelining"):
+            SmtpTransport._send_sequential(conn, sender, recipients, payload)
+            return
+        commands = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{r}>" for r in recipients] + ["DATA"]
+        conn.send("".join(f"{command}\r\n" for command in commands))
+        mail_reply = conn.getreply()
+        rcpt_replies = [conn.getreply() for _ in recipients]
+        data_code, data_resp = conn.getreply()
+        accepted = [reply for reply in rcpt_replies if reply[0] in (250, 251)]
+        if mail_reply[0] != 250 or not accepted or data_code != 354:
+            if data_code == 354:
+                conn.send(b".\r\n")
+                conn.getreply()
+            conn.rset()
+            if mail_reply[0] != 250:
+                raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], sender)
+            if not accepted:
+                raise smtplib.SMTPRecipientsRefused(dict(zip(recipients, rcpt_replies)))
+            raise smtplib.SMTPDataError(data_code, data_resp)
+        SmtpTransport._send_payload(conn, payload)
+
+    @staticmethod
+    def _send_sequential(conn, sender, recipients, payload):
+        code, resp = conn.mail(sender)
+        if code != 250:
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, sender)
+        refused = {}
+        for recipient in recipients:
+            code, resp = conn.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, resp)
+        if len(refused) == len(recipients):
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        code, resp = conn.docmd("DATA")
+        if code != 354:
+            conn.rset()
+            raise smtplib.SMTPDataError(code, resp)
+        SmtpTransport._send_payload(conn, payload)
+
+    @staticmethod
+    def _send_payload(conn, payload):
+        # The payload is already dot-stuffed; large attachments are encoded while they are written.
+        # Small parts are coalesced so a short message still leaves in one write instead of
+        # trickling out in pieces that Nagle's algorithm holds back.
+        buffer, buffered = [], 0
+        for chunk in payload.chunks():
+            if len(chunk) >= SEND_BUFFER_BYTES:
+                if buffer:
+                    conn.send(b"".join(buffer))
+                    buffer, buffered = [], 0
+                conn.send(chunk)
+                continue
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= SEND_BUFFER_BYTES:
+                conn.send(b"".join(buffer))
+                buffer, buffered = [], 0
+        buffer.append(b".\r\n")
+        conn.send(b"".join(buffer))
+        code, resp = conn.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+
+
+@dataclass
+class TransportSpec:
+    kind: str = "outlook"
+    smtp: SmtpSettings = None
+    factory: object = None
+
+    def create(self) -> MailTransport:
+        if self.factory is not None:
+            return self.factory()
+        if self.kind == "smtp":
+            return SmtpTransport(self.smtp)
+        return OutlookTransport()